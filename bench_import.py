@@ -0,0 +1,43 @@
+# fluent_python 패키지 임포트 시간 측정
+"""
+짧게 실행되는 CLI 워커는 임포트 시간이 곧 시작 시간이다.
+매번 새 인터프리터를 띄워서 각 문장을 실행하는 데 걸린 시간을 잰다. (이미 로딩된 모듈의 영향을 받지 않도록)
+자세한 모듈별 시간은 python -X importtime -c "import fluent_python" 으로 볼 수 있다.
+"""
+import statistics
+import subprocess
+import sys
+
+CASES = [
+    ('python 시작만', 'pass'),
+    ('import fluent_python', 'import fluent_python'),
+    ('FrenchDeck 사용', 'import fluent_python; fluent_python.FrenchDeck()'),
+    ('Vector2d 사용', 'import fluent_python; fluent_python.Vector2d(3, 4)'),
+    ('memoize 사용', 'import fluent_python; fluent_python.memoize'),
+    ('from fluent_python import *', 'from fluent_python import *'),
+    ('mcc_by_avt 사용 (pandas 로딩)', 'import fluent_python; fluent_python.mcc_by_avt'),
+]
+
+TIMER = ('import time; _t = time.perf_counter(); {}; '
+         'print(time.perf_counter() - _t)')
+
+
+def measure(stmt, repeat=5):
+    times = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-c', TIMER.format(stmt)],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              universal_newlines=True)
+        if proc.returncode != 0:
+            return None
+        times.append(float(proc.stdout))
+    return statistics.median(times)
+
+
+if __name__ == '__main__':
+    for label, stmt in CASES:
+        elapsed = measure(stmt)
+        if elapsed is None:
+            print("{:<32} 실패 (의존 패키지 없음?)".format(label))
+        else:
+            print("{:<32} {:8.2f}ms".format(label, elapsed * 1000))
@@ -0,0 +1,74 @@
+"""
+Book.py와 high_performance_python.py에서 다시 쓸 만한 코드들을 모은 패키지
+
+Book.py는 정리 노트이므로 임포트하면 모든 예제(출력, 의도한 예외, 10만 행 데이터 생성 등)가 실행된다.
+이 패키지는 임포트할 때 아무것도 실행하지 않고, 하위 모듈도 이름을 처음 사용할 때 로딩한다. (PEP 562)
+pandas, NumPy는 report 등 그것을 쓰는 모듈이 처음 로딩될 때 함께 로딩된다.
+
+from fluent_python import *는 __all__의 이름을 모두 가져오므로 해당 하위 모듈들을 전부 로딩한다.
+임포트할 때 pandas나 NumPy를 로딩하는 모듈의 이름은 __all__에서 빼 두었다.
+- report: make_sample_data, mcc_by_avt, cat_report, id_report, payway_report (pandas, NumPy)
+- vector_n, ring_buffer, record_table, int_map: VectorN, RingBuffer, record_table, IntMap (NumPy가 있으면)
+그래서 별표 임포트는 pandas가 없어도 실패하지 않고 pandas, NumPy를 로딩하는 시간도 들지 않는다.
+이 이름들은 fluent_python.mcc_by_avt, fluent_python.RingBuffer처럼 직접 가져온다.
+나머지 하위 모듈은 모두 로딩되므로(ingest의 asyncio 등) 별표 임포트는 import fluent_python보다 훨씬 느리다.
+시작 시간이 중요하면 bench_import.py로 재 보고 필요한 이름만 쓴다.
+
+    import fluent_python
+    fluent_python.FrenchDeck      # 이 시점에 fluent_python.deck이 로딩된다.
+"""
+import importlib
+
+# 이름 -> 그 이름이 정의된 하위 모듈
+_LAZY = {
+    'Card': 'deck',
+    'FrenchDeck': 'deck',
+    'Vector': 'vector',
+    'Vector2d': 'vector',
+    'VectorN': 'vector_n',
+    'Tombola': 'tombola',
+    'ShardedTombola': 'tombola',
+    'clock': 'decorators',
+    'timefn': 'decorators',
+    'Profiler': 'profiling',
+    'make_sample_data': 'report',
+    'mcc_by_avt': 'report',
+    'cat_report': 'report',
+    'id_report': 'report',
+    'payway_report': 'report',
+    'SketchReport': 'sketch',
+    'id_report_sketch': 'sketch',
+    'cat_report_sketch': 'sketch',
+    'memoize': 'memoize',
+    'RingBuffer': 'ring_buffer',
+    'IntMap': 'int_map',
+    'external_sort': 'external_sort',
+    'Pipeline': 'pipeline',
+    'record_table': 'record_table',
+    'Ingestor': 'ingest',
+    'Aggregates': 'ingest',
+}
+
+_SUBMODULES = frozenset(_LAZY.values())
+
+# 임포트할 때 pandas, NumPy를 로딩하는 모듈의 이름은 별표 임포트에서 뺀다.
+_NOT_IN_ALL = frozenset({'report', 'vector_n', 'ring_buffer', 'record_table', 'int_map'})
+
+__all__ = sorted(name for name, module in _LAZY.items() if module not in _NOT_IN_ALL)
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        module = importlib.import_module('.' + _LAZY[name], __name__)
+        value = getattr(module, name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    # 다음부터는 __getattr__을 거치지 않도록 모듈 전역에 저장한다.
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY) | _SUBMODULES)
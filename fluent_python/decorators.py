@@ -0,0 +1,30 @@
+# 7.7 clock 데커레이터, 고성능 파이썬 2.4 timefn 데커레이터
+import functools
+from time import perf_counter
+
+
+def clock(func):
+    @functools.wraps(func)
+    def clocked(*args):
+        start = perf_counter()
+        result = func(*args)
+        elasped = perf_counter() - start
+
+        name = func.__name__
+        arg_str = ', '.join(repr(arg) for arg in args)
+        print("[{}s] {}, {} -> {}".format(elasped, name, arg_str, result))
+        return result
+    return clocked
+
+
+def timefn(fn):
+    @functools.wraps(fn)
+    def measure_time(*args, **kwargs):
+        start = perf_counter()
+        result = fn(*args, **kwargs)
+        end = perf_counter()
+        print("elapsed time of {}: {}".format(fn.__name__, end-start))
+        return result
+
+    # high_performance_python.py의 원본은 measure_time()을 호출해서 반환하는 실수가 있다.
+    return measure_time
@@ -0,0 +1,176 @@
+# 2.7 list.sort()와 sorted 확장: 메모리보다 큰 데이터 정렬하기
+"""
+sorted(fruits, key=len)은 모든 항목을 메모리에 올려 놓고 정렬한다.
+external_sort()는 같은 key=, reverse= 인터페이스로, 메모리에 다 올릴 수 없는 레코드 스트림을 정렬한다.
+
+1) 입력을 run_size개씩 끊어 각 덩어리(run)를 메모리에서 정렬하고 임시 파일에 쓴다.
+   - key는 레코드마다 한 번만 계산해서 (key, 순번, 레코드)로 저장한다.
+   - 파일에는 block_size개씩 묶어 pickle한 블록을 이어서 쓴다. (레코드마다 pickle하는 것보다 작고 빠르다.)
+   - workers > 1이면 run 정렬과 쓰기를 프로세스 풀에서 한다. 이때 key와 레코드는 pickle 가능해야 한다.
+2) heapq.merge로 run 파일들을 k-way 병합한다. run마다 블록 하나씩만 메모리에 둔다.
+   - 한 번에 병합하는 run은 max_fan_in개까지이다. run이 그보다 많으면 max_fan_in개씩 묶어 중간 run으로 병합하는 것을
+     max_fan_in개 이하가 남을 때까지 반복한다. (다단계 병합)
+   - 그래서 입력이 아무리 커도 동시에 열린 파일은 max_fan_in개, 병합 중 메모리는 max_fan_in * block_size개 레코드 정도이다.
+     (workers > 1이면 중간 병합도 프로세스 풀에서 하므로 workers배가 된다.)
+
+결과는 지연 반복자이므로 다음 단계가 바로 스트리밍으로 처리할 수 있다.
+sorted처럼 안정 정렬이다. (같은 key는 입력 순서를 유지한다. 순번을 함께 저장하는 이유이다.)
+"""
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+
+
+def _identity(x):
+    return x
+
+
+def _decorate(records, key, start, reverse):
+    # reverse=True일 때도 안정 정렬이 되도록 순번의 부호를 바꾼다.
+    sign = -1 if reverse else 1
+    return [(key(record), sign * i, record) for i, record in enumerate(records, start)]
+
+
+def _write_run(path, entries, reverse, block_size):
+    # 순번이 모두 다르므로 튜플 비교가 레코드까지 가지 않는다. key 함수 없이 튜플 그대로 정렬한다.
+    entries.sort(reverse=reverse)
+    with open(path, 'wb') as f:
+        for i in range(0, len(entries), block_size):
+            pickle.dump(entries[i:i + block_size], f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _sort_run(path, records, key, start, reverse, block_size):
+    # 프로세스 풀에서 실행된다.
+    return _write_run(path, _decorate(records, key, start, reverse), reverse, block_size)
+
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+def _merge_runs(paths, out_path, reverse, block_size):
+    # 중간 병합: run 여러 개를 하나의 run 파일로 합치고 입력 run들은 지운다.
+    with open(out_path, 'wb') as f:
+        block = []
+        for entry in heapq.merge(*(_read_run(p) for p in paths), reverse=reverse):
+            block.append(entry)
+            if len(block) == block_size:
+                pickle.dump(block, f, pickle.HIGHEST_PROTOCOL)
+                block = []
+        if block:
+            pickle.dump(block, f, pickle.HIGHEST_PROTOCOL)
+    for path in paths:
+        os.remove(path)
+    return out_path
+
+
+def _reduce_runs(paths, workdir, reverse, block_size, max_fan_in, executor):
+    """run이 max_fan_in개 이하가 될 때까지 max_fan_in개씩 묶어 병합한다."""
+    level = 0
+    while len(paths) > max_fan_in:
+        groups = [paths[i:i + max_fan_in] for i in range(0, len(paths), max_fan_in)]
+        outs = [os.path.join(workdir, 'merge{}-{:06d}'.format(level, j)) for j in range(len(groups))]
+        if executor is None:
+            paths = [_merge_runs(group, out, reverse, block_size) for group, out in zip(groups, outs)]
+        else:
+            paths = list(executor.map(_merge_runs, groups, outs, repeat(reverse), repeat(block_size)))
+        level += 1
+    return paths
+
+
+def external_sort(iterable, key=None, reverse=False, run_size=100000, block_size=1024,
+                  workers=1, tmpdir=None, max_fan_in=64):
+    """
+    iterable을 정렬한 결과를 하나씩 돌려주는 반복자.
+    run_size: 메모리에서 한 번에 정렬할 레코드 수, block_size: 파일에 한 번에 쓰고 읽는 레코드 수
+    tmpdir: run 파일을 둘 디렉터리 (기본: 시스템 임시 디렉터리)
+    max_fan_in: 한 번에 병합할 run 파일 수의 상한 (동시에 열리는 파일 수)
+    """
+    if max_fan_in < 2:
+        raise ValueError('max_fan_in must be at least 2')
+    if key is None:
+        key = _identity
+    it = iter(iterable)
+    first = list(islice(it, run_size))
+    nxt = list(islice(it, 1))
+    if not nxt:
+        # 한 run에 다 들어가면 파일을 쓰지 않는다.
+        return (record for _, _, record in
+                sorted(_decorate(first, key, 0, reverse), reverse=reverse))
+    return _external_sort(first + nxt, it, key, reverse, run_size, block_size, workers, tmpdir, max_fan_in)
+
+
+def _chunks(first, it, run_size):
+    yield first
+    while True:
+        chunk = list(islice(it, run_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _external_sort(first, it, key, reverse, run_size, block_size, workers, tmpdir, max_fan_in):
+    workdir = tempfile.mkdtemp(prefix='extsort-', dir=tmpdir)
+    try:
+        paths = []
+        start = 0
+        chunks = _chunks(first, it, run_size)
+        if workers > 1:
+            with ProcessPoolExecutor(workers) as executor:
+                pending = []
+                for chunk in chunks:
+                    path = os.path.join(workdir, 'run{:06d}'.format(len(paths) + len(pending)))
+                    pending.append(executor.submit(_sort_run, path, chunk, key, start, reverse, block_size))
+                    start += len(chunk)
+                    # 동시에 메모리에 있는 run을 workers개로 제한한다.
+                    if len(pending) >= workers:
+                        paths.append(pending.pop(0).result())
+                paths.extend(f.result() for f in pending)
+                paths = _reduce_runs(paths, workdir, reverse, block_size, max_fan_in, executor)
+        else:
+            for chunk in chunks:
+                path = os.path.join(workdir, 'run{:06d}'.format(len(paths)))
+                paths.append(_sort_run(path, chunk, key, start, reverse, block_size))
+                start += len(chunk)
+            paths = _reduce_runs(paths, workdir, reverse, block_size, max_fan_in, None)
+
+        merged = heapq.merge(*(_read_run(p) for p in paths), reverse=reverse)
+        for _, _, record in merged:
+            yield record
+    finally:
+        # 끝까지 읽었거나 반복자가 닫히면(close, 가비지 수집) run 파일들을 지운다.
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    import random
+    import string
+    from time import perf_counter
+
+    fruits = ["grape", "rasberry", "apple", "banana"]
+    print(list(external_sort(fruits, key=len)) == sorted(fruits, key=len))
+    print(list(external_sort(fruits, key=str.lower, reverse=True, run_size=2)))
+
+    n = 1000000
+    words = [''.join(random.choice(string.ascii_letters) for _ in range(8)) for _ in range(n)]
+
+    start = perf_counter()
+    expected = sorted(words, key=str.lower)
+    print("sorted: {:.2f}s".format(perf_counter() - start))
+
+    for workers in (1, 4):
+        start = perf_counter()
+        result = list(external_sort(words, key=str.lower, run_size=100000, workers=workers))
+        print("external_sort workers={}: {:.2f}s".format(workers, perf_counter() - start))
+        assert result == expected
@@ -0,0 +1,365 @@
+# Project 확장: asyncio로 거래 데이터 받아서 리포트 갱신하기
+"""
+Project의 mcc_by_avt, cat_report, id_report는 미리 만들어 둔 DataFrame 하나를 대상으로 한다.
+실제 거래 데이터는 소켓과 파일로 계속 들어오므로, 다음 구조로 받아서 집계를 갱신한다.
+
+소스(TCP 소켓, 파일) --레코드--> 배치 --bounded Queue--> 실행기(executor)에서 파싱/부분 집계 --> 이벤트 루프에서 병합
+
+- 여러 소스를 동시에 읽는다. 레코드는 줄바꿈 구분(b'...\\n') 또는 길이 접두(4바이트 big-endian) 형식이다.
+  레코드 하나가 max_record_size를 넘으면 (길이 접두가 깨졌거나 줄바꿈이 없으면) ValueError를 낸다.
+  길이 접두 형식은 다음 레코드의 시작을 알 수 없으므로 다시 맞추지(resync) 않고 그 소스를 멈춘다.
+- 큐의 크기가 정해져 있으므로 집계가 밀리면 소스를 읽는 쪽이 기다린다. (backpressure)
+- 파싱과 집계는 실행기에서 실행하므로 이벤트 루프를 막지 않는다.
+  부분 집계는 순수 함수이므로 ProcessPoolExecutor도 사용할 수 있다.
+- 레코드 형식: id,cat,payway,mcc,avt,amt
+  형식이 맞지 않는 레코드는 건너뛰고 Aggregates.errors에 센다. 레코드 하나 때문에 수집 전체가 멈추지 않게 한다.
+"""
+import asyncio
+import random
+import struct
+from collections import defaultdict
+from time import perf_counter
+
+_LENGTH = struct.Struct('>I')
+MAX_RECORD_SIZE = 1 << 20
+
+
+# 레코드 읽기
+# 레코드마다 await/yield하면 그 비용이 처리량을 결정하므로, 소스는 읽은 청크 단위로 레코드 리스트를 돌려준다.
+async def read_lines(reader, chunk_size=1 << 16, max_record_size=MAX_RECORD_SIZE):
+    """줄바꿈으로 구분된 레코드들"""
+    tail = b''
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            if tail:
+                yield [tail]
+            return
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        if len(tail) > max_record_size:
+            raise ValueError('line longer than max_record_size ({} bytes)'.format(max_record_size))
+        records = [line.rstrip(b'\r') for line in lines if line]
+        if records:
+            yield records
+
+
+async def read_length_prefixed(reader, chunk_size=1 << 16, max_record_size=MAX_RECORD_SIZE):
+    """
+    4바이트 길이 + 본문 형식의 레코드들
+    길이가 max_record_size를 넘으면 본문을 기다리지 않고 바로 ValueError를 낸다.
+    (깨진 접두 하나 때문에 4GiB까지 버퍼에 쌓는 일을 막는다.)
+    """
+    # bytearray에 이어 붙이고 처리한 앞부분만 지우므로 남은 조각을 매번 복사하지 않는다.
+    buf = bytearray()
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            if buf:
+                raise asyncio.IncompleteReadError(bytes(buf), None)
+            return
+        buf += chunk
+        records = []
+        pos = 0
+        while len(buf) - pos >= _LENGTH.size:
+            (length,) = _LENGTH.unpack_from(buf, pos)
+            if length > max_record_size:
+                raise ValueError('record length {} exceeds max_record_size ({} bytes)'.format(
+                    length, max_record_size))
+            end = pos + _LENGTH.size + length
+            if end > len(buf):
+                break
+            records.append(bytes(buf[pos + _LENGTH.size:end]))
+            pos = end
+        del buf[:pos]
+        if records:
+            yield records
+
+
+class AsyncFile:
+    """
+    read(n) 코루틴만 가진 파일 래퍼. read_lines/read_length_prefixed에 StreamReader 대신 넘길 수 있다.
+    파일 읽기는 블로킹이므로 기본 실행기의 스레드에서 한다.
+    소비자가 read를 호출할 때만 읽으므로 따로 흐름 제어가 필요 없다.
+    EOF에서 파일을 닫지만, 수집이 취소되거나 실패해도 닫히도록 async with로 쓴다.
+
+        async with AsyncFile(path) as f:
+            await ingestor.run(read_lines(f))
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+
+    async def read(self, n):
+        if self._file.closed:
+            return b''
+        loop = asyncio.get_running_loop()
+        chunk = await loop.run_in_executor(None, self._file.read, n)
+        if not chunk:
+            self.close()
+        return chunk
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+# 파싱/집계 (실행기에서 실행된다.)
+def parse_batch(records):
+    """(파싱한 레코드 리스트, 형식이 맞지 않아 건너뛴 레코드 수)"""
+    out = []
+    errors = 0
+    for record in records:
+        try:
+            id_, cat, payway, mcc, avt, amt = record.decode().split(',')
+            out.append((id_, cat, payway, mcc, avt, int(amt)))
+        except ValueError:
+            # 필드 수가 다르거나 amt가 정수가 아니거나 UTF-8이 아닌 경우 (UnicodeDecodeError도 ValueError)
+            errors += 1
+    return out, errors
+
+
+def aggregate_batch(records):
+    """
+    배치 하나의 부분 집계. 키별 [count, sum]을 담은 dict들을 돌려준다.
+    mcc_by_avt는 (mcc, avt)별 건수를 센다.
+    """
+    by_cat = defaultdict(lambda: [0, 0])
+    by_id = defaultdict(lambda: [0, 0])
+    by_payway = defaultdict(lambda: [0, 0])
+    mcc_avt = defaultdict(int)
+    rows, errors = parse_batch(records)
+    for id_, cat, payway, mcc, avt, amt in rows:
+        acc = by_cat[cat]
+        acc[0] += 1
+        acc[1] += amt
+        acc = by_id[id_]
+        acc[0] += 1
+        acc[1] += amt
+        acc = by_payway[(payway, cat)]
+        acc[0] += 1
+        acc[1] += amt
+        mcc_avt[(mcc, avt)] += 1
+    # 프로세스 간에 pickle할 수 있도록 일반 dict로 돌려준다.
+    return len(rows), errors, dict(by_cat), dict(by_id), dict(by_payway), dict(mcc_avt)
+
+
+class Aggregates:
+    """cat_report, id_report, payway_report, mcc_by_avt에 해당하는 누적 집계"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.by_cat = defaultdict(lambda: [0, 0])
+        self.by_id = defaultdict(lambda: [0, 0])
+        self.by_payway = defaultdict(lambda: [0, 0])
+        self.mcc_avt = defaultdict(int)
+
+    def merge(self, partial_result):
+        count, errors, by_cat, by_id, by_payway, mcc_avt = partial_result
+        self.count += count
+        self.errors += errors
+        for total, part in ((self.by_cat, by_cat), (self.by_id, by_id), (self.by_payway, by_payway)):
+            for key, (n, s) in part.items():
+                acc = total[key]
+                acc[0] += n
+                acc[1] += s
+        for key, n in mcc_avt.items():
+            self.mcc_avt[key] += n
+
+    @staticmethod
+    def _report(table):
+        return {key: {'mean': s / n, 'sum': s} for key, (n, s) in sorted(table.items())}
+
+    def cat_report(self):
+        return self._report(self.by_cat)
+
+    def id_report(self):
+        return self._report(self.by_id)
+
+    def payway_report(self):
+        return self._report(self.by_payway)
+
+    def mcc_by_avt(self, mcc_col=None, avt_col=None, squeeze=False):
+        """{avt: {mcc(또는 mcc 앞 두 자리): 건수}}"""
+        out = defaultdict(lambda: defaultdict(int))
+        for (mcc, avt), n in self.mcc_avt.items():
+            if mcc_col is not None and mcc not in mcc_col:
+                continue
+            if avt_col is not None and avt not in avt_col:
+                continue
+            out[avt][mcc[0:2] if squeeze else mcc] += n
+        return {avt: dict(sorted(row.items())) for avt, row in sorted(out.items())}
+
+
+class Ingestor:
+    """
+    여러 소스에서 레코드를 읽어 Aggregates를 갱신한다.
+    batch_size: 실행기로 넘기는 배치 크기, queue_size: 대기할 수 있는 배치 수
+    executor: None이면 이벤트 루프의 기본 스레드 풀을 쓴다.
+    """
+
+    def __init__(self, batch_size=1000, queue_size=16, executor=None, workers=1):
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.executor = executor
+        self.workers = workers
+        self.aggregates = Aggregates()
+        # 배치의 첫 레코드를 받은 시점부터 집계에 반영될 때까지의 시간
+        self.latencies = []
+
+    async def _produce(self, source, queue):
+        batch, first_seen = [], None
+        async for records in source:
+            if not batch:
+                first_seen = perf_counter()
+            batch.extend(records)
+            while len(batch) >= self.batch_size:
+                await queue.put((first_seen, batch[:self.batch_size]))
+                batch = batch[self.batch_size:]
+                first_seen = perf_counter()
+        if batch:
+            await queue.put((first_seen, batch))
+
+    async def _consume(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            first_seen, batch = item
+            result = await loop.run_in_executor(self.executor, aggregate_batch, batch)
+            self.aggregates.merge(result)
+            self.latencies.append(perf_counter() - first_seen)
+
+    @staticmethod
+    async def _wait_all(tasks, watch=()):
+        """
+        tasks가 모두 끝날 때까지 기다린다.
+        tasks나 watch 중 하나라도 예외로 끝나면 바로 그 예외를 다시 발생시킨다.
+        (소비자가 죽었는데 생산자가 꽉 찬 큐의 put에서 영원히 기다리는 일을 막는다.)
+        """
+        waiting = set(tasks)
+        while waiting:
+            done, _ = await asyncio.wait(waiting | set(watch), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+            waiting -= done
+
+    async def run(self, *sources):
+        """sources: 레코드(bytes) 리스트를 돌려주는 비동기 반복자들 (예: read_lines(reader))"""
+        queue = asyncio.Queue(self.queue_size)
+        consumers = [asyncio.ensure_future(self._consume(queue)) for _ in range(self.workers)]
+        producers = [asyncio.ensure_future(self._produce(source, queue)) for source in sources]
+        tasks = consumers + producers
+        try:
+            await self._wait_all(producers, watch=consumers)
+            stop = asyncio.ensure_future(self._stop(queue, len(consumers)))
+            tasks.append(stop)
+            await self._wait_all(consumers + [stop])
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self.aggregates
+
+    @staticmethod
+    async def _stop(queue, n):
+        for _ in range(n):
+            await queue.put(None)
+
+
+# 로컬 테스트용 피드
+def random_record(rng=random):
+    return '{},{},{},{},{},{}'.format(
+        'id{}'.format(rng.randrange(1000)),
+        rng.choice(['food', 'taxi', 'clothes', 'drink']),
+        rng.choice(['samsung', 'ic']),
+        rng.choice(['1101', '1102', '1103', '1201', '1202', '1203', '2101', '2102']),
+        rng.choice(['01', '02', '03', '04', '05', '06', '07', '08']),
+        rng.randint(1000, 100000)).encode()
+
+
+def write_feed_file(path, n, seed=None):
+    rng = random.Random(seed)
+    with open(path, 'wb') as f:
+        for _ in range(n):
+            f.write(random_record(rng) + b'\n')
+
+
+async def serve_feed(n, length_prefixed=False, seed=None, host='127.0.0.1', chunk_size=1 << 16):
+    """
+    접속한 클라이언트에게 n개의 레코드를 보내고 연결을 닫는 TCP 서버.
+    레코드는 미리 만들어 두어 생성 비용이 같은 이벤트 루프의 수신 측정에 섞이지 않게 한다.
+    """
+    rng = random.Random(seed)
+    records = [random_record(rng) for _ in range(n)]
+    if length_prefixed:
+        payload = b''.join(_LENGTH.pack(len(r)) + r for r in records)
+    else:
+        payload = b''.join(r + b'\n' for r in records)
+
+    async def handle(reader, writer):
+        view = memoryview(payload)
+        for pos in range(0, len(payload), chunk_size):
+            writer.write(view[pos:pos + chunk_size])
+            # 클라이언트가 느리면 여기서 기다린다. (TCP 흐름 제어)
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, host, 0)
+
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    n = 200000
+
+    async def main(executor, workers):
+        line_server = await serve_feed(n, seed=1)
+        frame_server = await serve_feed(n, length_prefixed=True, seed=2)
+        line_port = line_server.sockets[0].getsockname()[1]
+        frame_port = frame_server.sockets[0].getsockname()[1]
+
+        r1, w1 = await asyncio.open_connection('127.0.0.1', line_port)
+        r2, w2 = await asyncio.open_connection('127.0.0.1', frame_port)
+        ingestor = Ingestor(batch_size=2000, executor=executor, workers=workers)
+        async with AsyncFile(path) as r3:
+            start = perf_counter()
+            agg = await ingestor.run(read_lines(r1), read_length_prefixed(r2), read_lines(r3))
+            elapsed = perf_counter() - start
+
+        for server in (line_server, frame_server):
+            server.close()
+            await server.wait_closed()
+        w1.close()
+        w2.close()
+
+        lat = sorted(ingestor.latencies)
+        print("{} records in {:.2f}s: {:.0f} records/s".format(agg.count, elapsed, agg.count / elapsed))
+        print("batch latency p50 {:.1f}ms, p99 {:.1f}ms".format(
+            lat[len(lat) // 2] * 1000, lat[int(len(lat) * 0.99)] * 1000))
+        return agg
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'feed.txt')
+        write_feed_file(path, n, seed=3)
+
+        agg = asyncio.run(main(None, 1))
+        print(agg.cat_report())
+        print(agg.mcc_by_avt(mcc_col=['1101', '1102', '1103'], avt_col=['01', '02'], squeeze=True))
+
+        # 기본 실행기 스레드가 이미 떠 있으므로 fork 대신 spawn으로 워커를 만든다.
+        with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context('spawn')) as pool:
+            asyncio.run(main(pool, 2))
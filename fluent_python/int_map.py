@@ -0,0 +1,382 @@
+# 3.9 dict와 set의 내부 구조 확장: 정수 키 전용 해시 맵
+"""
+dict는 해시 테이블의 1/3 이상을 비워 두고, 버킷마다 해시값/키 참조/값 참조를 저장한다.
+키와 값이 int/float이면 그 객체들도 따로 할당되므로 항목 하나에 100바이트가 넘게 든다.
+id_report처럼 수억 개의 id별 합계를 구할 때는 이 메모리가 문제가 된다.
+
+IntMap은 int64 키 배열과 값 배열(float64 또는 int64) 두 개만 쓰는 개방 주소법(open addressing) 해시 맵이다.
+- 3.9의 해시 테이블 알고리즘과 같지만, 충돌하면 바로 다음 버킷을 본다. (선형 탐사, linear probing)
+- 빈 버킷은 키 배열에 EMPTY(int64 최솟값)를 넣어 표시하므로 EMPTY는 키로 쓸 수 없다.
+- 박싱된 객체가 없으므로 항목당 (8 + 8) / 적재율 바이트, 기본 적재율 0.8이면 20바이트 정도이다.
+- add_at(keys, values)로 여러 키의 합계를 한 번에 갱신한다.
+  NumPy가 있으면 배치 안의 중복 키를 먼저 합치고, 해시 계산과 선형 탐사도 배치 전체에 대해 벡터로 한다.
+  (탐사 한 단계마다 아직 자리를 못 찾은 키들만 남기고 다음 버킷으로 옮긴다.) 테이블이 늘어날 때의 재배치도 같다.
+- 읽기는 collections.abc.Mapping 인터페이스를 따른다. 삭제는 지원하지 않는다.
+  int64 범위의 정수가 아닌 키는 없는 키로 본다. (m.get('a')는 None, m['a']는 KeyError)
+- 쓰기(m[k] = v, add, add_at)는 정수와 정수값 float(1.0 등)을 int 키로 바꾸고, 그 밖의 키는 TypeError,
+  int64 범위를 넘는 정수는 OverflowError를 낸다. NumPy가 있든 없든 같다.
+"""
+import collections.abc
+import operator
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EMPTY = -(1 << 63)
+_MAX = (1 << 63) - 1
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15  # 2^64 / 황금비: 연속된 id도 테이블에 고르게 퍼진다. (피보나치 해싱)
+
+
+def _as_key(key):
+    # int64 범위의 정수면 int로, 아니면 None (없는 키로 취급한다.)
+    if isinstance(key, float):
+        if not key.is_integer():
+            return None
+        key = int(key)
+    else:
+        try:
+            key = operator.index(key)
+        except TypeError:
+            return None
+    if not EMPTY < key <= _MAX:
+        return None
+    return key
+
+
+def _check_key(key):
+    # 쓰기용: _as_key와 같이 바꾸되, 키로 쓸 수 없으면 예외를 낸다.
+    k = _as_key(key)
+    if k is not None:
+        return k
+    if key == EMPTY:
+        raise ValueError('{} is reserved as the empty marker'.format(EMPTY))
+    if (isinstance(key, float) and key.is_integer()) or hasattr(key, '__index__'):
+        raise OverflowError('IntMap key out of int64 range: {!r}'.format(key))
+    raise TypeError('IntMap keys must be integers, not {!r}'.format(key))
+
+
+def _np_check_keys(keys):
+    # _check_key의 배치 버전. 정수가 아닌 키를 int64로 바꾸면서 잘라 버리지 않도록 dtype별로 확인한다.
+    keys = np.asarray(keys)
+    kind = keys.dtype.kind
+    if kind in 'iub':
+        if kind == 'u' and len(keys) and keys.max() > _MAX:
+            raise OverflowError('IntMap key out of int64 range: {!r}'.format(keys.max().item()))
+        keys = keys.astype(np.int64)
+    elif kind == 'f':
+        bad = np.flatnonzero(~((keys == np.floor(keys)) & (keys > float(EMPTY)) & (keys < -float(EMPTY))))
+        if len(bad):
+            _check_key(keys[bad[0]].item())
+        keys = keys.astype(np.int64)
+    elif kind == 'O' or keys.ndim != 1:
+        # int64를 넘는 int가 섞인 리스트, Decimal 등은 하나씩 확인한다.
+        keys = np.fromiter((_check_key(k) for k in keys.ravel().tolist()), dtype=np.int64, count=keys.size)
+    else:
+        raise TypeError('IntMap keys must be integers, not {} values'.format(keys.dtype))
+    if (keys == EMPTY).any():
+        raise ValueError('{} is reserved as the empty marker'.format(EMPTY))
+    return keys
+
+
+class _ItemsView(collections.abc.ItemsView):
+    # Mapping.items()는 키마다 __getitem__을 다시 부르므로 배열을 직접 읽는다.
+    def __iter__(self):
+        m = self._mapping
+        values = m._values
+        for i, key in enumerate(m._keys):
+            if key != EMPTY:
+                yield key, values[i]
+
+
+class _ValuesView(collections.abc.ValuesView):
+    def __iter__(self):
+        m = self._mapping
+        values = m._values
+        for i, key in enumerate(m._keys):
+            if key != EMPTY:
+                yield values[i]
+
+
+# 벡터 해시 계산이 uint64 안에서 넘치지 않는 테이블 크기의 상한 (그보다 크면 파이썬 경로로 처리한다.)
+_NP_MAX_SIZE = 1 << 32
+
+
+class IntMap(collections.abc.Mapping):
+
+    def __init__(self, items=(), value_typecode='d', counts=False, capacity=8, load_factor=0.8):
+        if not 0 < load_factor < 1:
+            raise ValueError('load_factor must be between 0 and 1')
+        self.value_typecode = value_typecode
+        self.load_factor = load_factor
+        self._track_counts = counts
+        self._allocate(max(8, int(capacity / load_factor) + 1))
+        for key, value in (items.items() if isinstance(items, collections.abc.Mapping) else items):
+            self[key] = value
+
+    def _allocate(self, size):
+        self._size = size
+        self._keys = array('q', [EMPTY]) * size
+        self._values = array(self.value_typecode, [0]) * size
+        self._counts = array('q', [0]) * size if self._track_counts else None
+        self._len = 0
+        self._limit = int(size * self.load_factor)
+
+    def _slot(self, key):
+        # 키가 있으면 그 위치, 없으면 키가 들어갈 빈 위치를 돌려준다.
+        # 64비트 해시값 h를 (h * size) >> 64로 [0, size) 범위에 옮긴다.
+        # 테이블 크기가 2의 거듭제곱이 아니어도 되므로 적재율을 원하는 대로 맞출 수 있다.
+        keys = self._keys
+        size = self._size
+        i = (((key * _GOLDEN) & _MASK64) * size) >> 64
+        while True:
+            k = keys[i]
+            if k == key or k == EMPTY:
+                return i
+            i += 1
+            if i == size:
+                i = 0
+
+    def _insert_slot(self, key):
+        key = _check_key(key)
+        i = self._slot(key)
+        if self._keys[i] == EMPTY:
+            if self._len >= self._limit:
+                self._grow()
+                i = self._slot(key)
+            self._keys[i] = key
+            self._len += 1
+        return i
+
+    def _grow(self):
+        keys, values, counts, n = self._keys, self._values, self._counts, self._len
+        # 2배가 아니라 1.5배씩 늘려 늘어난 직후의 빈 공간을 줄인다.
+        self._allocate(self._size * 3 // 2)
+        if np is not None and self._size < _NP_MAX_SIZE:
+            old_keys = np.frombuffer(keys, dtype=np.int64)
+            used = old_keys != EMPTY
+            old_counts = np.frombuffer(counts, dtype=np.int64)[used] if counts is not None else None
+            self._np_insert(old_keys[used], np.frombuffer(values, dtype=values.typecode)[used], old_counts)
+            return
+        for j, key in enumerate(keys):
+            if key != EMPTY:
+                i = self._slot(key)
+                self._keys[i] = key
+                self._values[i] = values[j]
+                if counts is not None:
+                    self._counts[i] = counts[j]
+        self._len = n
+
+    # Mapping 인터페이스
+    def _find(self, key):
+        # 키가 있는 위치, 없으면 -1
+        key = _as_key(key)
+        if key is None:
+            return -1
+        i = self._slot(key)
+        return i if self._keys[i] != EMPTY else -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._values[i]
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return (key for key in self._keys if key != EMPTY)
+
+    def items(self):
+        return _ItemsView(self)
+
+    def values(self):
+        return _ValuesView(self)
+
+    def __repr__(self):
+        return '{}({} entries, {} bytes)'.format(type(self).__name__, len(self), self.nbytes())
+
+    # 갱신
+    def __setitem__(self, key, value):
+        # _insert_slot이 테이블을 늘리면 _values가 바뀌므로 위치를 먼저 구한다.
+        i = self._insert_slot(key)
+        self._values[i] = value
+
+    def add(self, key, value=1):
+        """키의 값에 value를 더한다. (없으면 0에서 시작한다.)"""
+        i = self._insert_slot(key)
+        self._values[i] += value
+        if self._counts is not None:
+            self._counts[i] += 1
+
+    def add_at(self, keys, values=1):
+        """
+        keys[j]의 값에 values[j]를 더한다. values가 스칼라면 모든 키에 같은 값을 더한다.
+        counts=True로 만들었으면 키마다 더한 횟수도 센다.
+        """
+        if np is not None and self._size * 3 // 2 < _NP_MAX_SIZE:
+            self._np_add_at(keys, values)
+            return
+        if not isinstance(values, collections.abc.Iterable):
+            values = [values] * len(keys)
+        for key, value in zip(keys, values):
+            self.add(key, value)
+
+    # NumPy 배치 경로
+    def _np_add_at(self, keys, values):
+        keys = _np_check_keys(keys)
+        dtype = np.float64 if self.value_typecode in 'fd' else np.int64
+        # 배치 안의 중복 키를 먼저 합친다.
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.ravel()
+        if np.ndim(values) == 0:
+            sums = np.bincount(inverse, minlength=len(uniq)).astype(dtype) * values
+        elif dtype is np.float64:
+            sums = np.bincount(inverse, weights=np.asarray(values, dtype=np.float64), minlength=len(uniq))
+        else:
+            # 정수 값은 float64로 바꾸면 2^53보다 큰 합이 틀리므로 add.at으로 더한다.
+            sums = np.zeros(len(uniq), dtype=np.int64)
+            np.add.at(sums, inverse, np.asarray(values, dtype=np.int64))
+        counts = np.bincount(inverse, minlength=len(uniq)) if self._counts is not None else None
+
+        # 이미 있는 키는 그 자리에 더하고, 새 키는 필요한 만큼 테이블을 늘린 뒤 넣는다.
+        slots = self._np_lookup(uniq)
+        found = slots >= 0
+        table_keys, table_values, table_counts = self._np_views()
+        table_values[slots[found]] += sums[found]
+        if counts is not None:
+            table_counts[slots[found]] += counts[found]
+        new = ~found
+        n_new = int(new.sum())
+        while self._len + n_new > self._limit:
+            self._grow()
+        if not n_new:
+            return
+        if self._size >= _NP_MAX_SIZE:
+            for key, total, n in zip(uniq[new].tolist(), sums[new].tolist(),
+                                     counts[new].tolist() if counts is not None else [0] * n_new):
+                i = self._insert_slot(key)
+                self._values[i] += total
+                if self._counts is not None:
+                    self._counts[i] += n
+            return
+        self._np_insert(uniq[new], sums[new], counts[new] if counts is not None else None)
+
+    def _np_views(self):
+        counts = np.frombuffer(self._counts, dtype=np.int64) if self._counts is not None else None
+        return (np.frombuffer(self._keys, dtype=np.int64),
+                np.frombuffer(self._values, dtype=self._values.typecode), counts)
+
+    def _np_hash(self, keys):
+        # _slot과 같은 (h * size) >> 64를 uint64 안에서 계산한다. h를 위/아래 32비트로 나누면
+        # (h_hi * size + ((h_lo * size) >> 32)) >> 32와 같고, size < 2^32이면 중간값이 넘치지 않는다.
+        h = keys.astype(np.uint64) * np.uint64(_GOLDEN)  # mod 2^64
+        size = np.uint64(self._size)
+        low = ((h & np.uint64(0xFFFFFFFF)) * size) >> np.uint64(32)
+        return (((h >> np.uint64(32)) * size + low) >> np.uint64(32)).astype(np.intp)
+
+    def _np_lookup(self, keys):
+        """키마다 테이블 안의 위치, 없으면 -1"""
+        table_keys = self._np_views()[0]
+        out = np.full(len(keys), -1, dtype=np.intp)
+        pending = np.arange(len(keys))
+        slots = self._np_hash(keys)
+        while len(pending):
+            current = table_keys[slots]
+            hit = current == keys[pending]
+            out[pending[hit]] = slots[hit]
+            # 찾았거나 빈 버킷에 닿은 키는 끝났다. 나머지는 다음 버킷으로 옮긴다.
+            going = ~hit & (current != EMPTY)
+            pending = pending[going]
+            slots = slots[going] + 1
+            slots[slots == self._size] = 0
+        return out
+
+    def _np_insert(self, keys, values, counts):
+        """테이블에 없는 서로 다른 키들을 넣는다. 자리는 미리 확보되어 있어야 한다."""
+        table_keys, table_values, table_counts = self._np_views()
+        slots = self._np_hash(keys)
+        self._len += len(keys)
+        while len(keys):
+            # 빈 버킷에 키를 써 본다. 같은 버킷을 노리는 키가 여럿이면 그중 하나만 남으므로,
+            # 다시 읽어서 자기 키가 남아 있는 쪽만 자리를 얻은 것으로 한다. (정렬 없이 충돌을 푼다.)
+            empty = np.flatnonzero(table_keys[slots] == EMPTY)
+            target = slots[empty]
+            table_keys[target] = keys[empty]
+            won = empty[table_keys[target] == keys[empty]]
+            table_values[slots[won]] = values[won]
+            if counts is not None:
+                table_counts[slots[won]] = counts[won]
+            # 못 넣은 키들은 지금 버킷이 다른 키로 차 있으므로 다음 버킷으로 옮긴다.
+            rest = np.ones(len(keys), dtype=bool)
+            rest[won] = False
+            keys, values, slots = keys[rest], values[rest], slots[rest] + 1
+            if counts is not None:
+                counts = counts[rest]
+            slots[slots == self._size] = 0
+
+    # 집계 보조
+    def count(self, key):
+        if self._counts is None:
+            raise TypeError('this IntMap does not track counts; create it with counts=True')
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._counts[i]
+
+    def mean(self, key):
+        return self[key] / self.count(key)
+
+    def nbytes(self):
+        total = self._keys.itemsize * self._size + self._values.itemsize * self._size
+        if self._counts is not None:
+            total += self._counts.itemsize * self._size
+        return total
+
+
+if __name__ == '__main__':
+    import random
+    import sys
+    import tracemalloc
+    from time import perf_counter
+
+    m = IntMap(counts=True)
+    m.add_at([1, 2, 1, 3], [1000, 2000, 3000, 4000])
+    print(dict(m.items()), m.mean(1), 2 in m, 4 in m)
+
+    # 100만 개의 서로 다른 id별 합계: dict와 IntMap의 메모리 비교
+    n = 1000000
+    ids = random.sample(range(10 ** 12), n)
+    amts = [float(random.randint(1000, 100000)) for _ in range(n)]
+
+    tracemalloc.start()
+    start = perf_counter()
+    d = {}
+    for key, amt in zip(ids, amts):
+        d[key] = d.get(key, 0.0) + amt
+    dict_time = perf_counter() - start
+    # 키/값 객체는 ids, amts 리스트와 공유되므로 dict 자체 크기 + 새로 만든 float 합계만 잡힌다.
+    # id가 리스트에 미리 있지 않은 실제 스트림에서는 키 int 객체(32바이트)도 따로 든다.
+    dict_bytes = tracemalloc.get_traced_memory()[0] + sum(sys.getsizeof(k) for k in ids)
+    tracemalloc.stop()
+    del d
+
+    tracemalloc.start()
+    start = perf_counter()
+    m = IntMap(capacity=n)
+    for i in range(0, n, 100000):
+        m.add_at(ids[i:i + 100000], amts[i:i + 100000])
+    map_time = perf_counter() - start
+    map_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # tracemalloc이 켜져 있으므로 시간은 두 경우를 비교하는 용도로만 본다.
+    print("dict: {:.1f} bytes/entry, {:.2f}s".format(dict_bytes / n, dict_time))
+    print("IntMap: {:.1f} bytes/entry, {:.2f}s ({})".format(map_bytes / n, map_time, m))
@@ -0,0 +1,452 @@
+# 7.8.1 functools.lru_cache() 확장: 메모이제이션 계층
+"""
+functools.lru_cache()는 프로세스 단위 캐시이다.
+- 프로세스가 재시작되면 캐시가 사라진다.
+- 만료 시간(TTL)이 없고, 항목 수(maxsize)로만 크기를 제한한다.
+- 여러 스레드가 같은 키를 동시에 호출하면 모두 값비싼 함수를 실행한다. (stampede)
+
+memoize()는 lru_cache와 같은 인터페이스(cache_info, cache_clear)를 유지하면서 다음을 추가한다.
+- path를 주면 sqlite 파일에 결과를 저장하는 디스크 계층을 사용한다.
+  재시작 후에도 남아 있고, 같은 파일을 쓰는 여러 프로세스가 공유한다.
+  만료된 행은 쓰기 PRUNE_EVERY번마다 지우고, disk_maxsize를 주면 오래 전에 쓴 행부터 지워 행 수를 제한한다.
+  asyncio에서는 디스크 읽기/쓰기를 기본 executor의 스레드에서 하므로 이벤트 루프를 막지 않는다.
+- ttl(초)이 지난 항목은 버린다.
+- max_bytes: pickle 직렬화 크기 기준으로 메모리 계층의 총 크기를 제한한다.
+  pickle할 수 없는 값은 메모리 계층에만 두고 크기는 0으로 센다. (디스크에도 쓰지 않는다.)
+- 같은 키에 대한 동시 miss는 한 번만 계산하고 나머지는 그 결과를 기다린다. (single-flight)
+  스레드와 asyncio 태스크 모두 지원한다.
+- hit/miss/계산 시간 통계를 cache_stats()로 돌려준다.
+"""
+import functools
+import inspect
+import os
+import pickle
+import threading
+from collections import OrderedDict, namedtuple
+from time import monotonic, perf_counter, time
+
+# lru_cache의 cache_info()와 같은 모양
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+CacheStats = namedtuple('CacheStats', 'hits misses disk_hits evictions currsize currbytes '
+                                      'miss_time avg_miss_time')
+
+_MISSING = object()
+_KWD_MARK = (object(),)
+
+
+def _make_key(args, kwargs, typed):
+    # functools._make_key와 같은 방식: 인수들을 하나의 해시가능한 튜플로 만든다.
+    key = args
+    if kwargs:
+        key += _KWD_MARK
+        for item in sorted(kwargs.items()):
+            key += item
+    if typed:
+        key += tuple(type(v) for v in args)
+        if kwargs:
+            key += tuple(type(v) for _, v in sorted(kwargs.items()))
+    return key
+
+
+class _Entry:
+    __slots__ = ('value', 'expires', 'nbytes')
+
+    def __init__(self, value, expires, nbytes):
+        self.value = value
+        self.expires = expires
+        self.nbytes = nbytes
+
+
+class _Flight:
+    """진행 중인 계산 하나. 같은 키를 기다리는 호출자들이 결과를 공유한다."""
+    __slots__ = ('owner', 'event', 'value', 'exc')
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.event = threading.Event()
+        self.value = None
+        self.exc = None
+
+
+def _retrieve_exception(task):
+    # 기다리던 호출자가 모두 취소된 뒤 계산이 실패해도 "exception was never retrieved" 경고가 나지 않게 한다.
+    if not task.cancelled():
+        task.exception()
+
+
+class DiskTier:
+    """
+    sqlite 파일에 (함수 이름, 키) -> pickle된 값을 저장한다.
+    sqlite 연결은 스레드 간에 공유할 수 없으므로 스레드마다 연결을 따로 연다.
+    WAL 모드를 사용해 여러 프로세스가 동시에 읽고 쓸 수 있다.
+
+    만료된 행은 다시 읽지 않으면 남으므로 쓰기 PRUNE_EVERY번마다 이 namespace의 만료된 행을 지운다.
+    maxsize를 주면 그때 행 수도 maxsize로 줄인다. INSERT OR REPLACE는 새 rowid를 받으므로
+    rowid가 작은 행(가장 오래 전에 쓴 행)부터 지운다. 정리 사이에는 maxsize를 PRUNE_EVERY개까지 넘을 수 있다.
+    """
+    PRUNE_EVERY = 64
+
+    def __init__(self, path, namespace, maxsize=None):
+        self.path = os.fspath(path)
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS memo ('
+                         'ns TEXT NOT NULL, key BLOB NOT NULL, value BLOB NOT NULL, '
+                         'expires REAL, PRIMARY KEY (ns, key))')
+        self.prune()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            import sqlite3  # 디스크 계층을 쓸 때만 로딩한다.
+            # fork된 자식 프로세스는 부모의 연결을 쓰면 안 된다.
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """(값, pickle 크기, 남은 유효 시간(초) 또는 None). 없거나 만료되었으면 _MISSING"""
+        row = self._connect().execute(
+            'SELECT value, expires FROM memo WHERE ns = ? AND key = ?',
+            (self.namespace, key)).fetchone()
+        if row is None:
+            return _MISSING
+        blob, expires = row
+        # 디스크 계층은 여러 프로세스가 공유하므로 monotonic이 아닌 벽시계 시간을 쓴다.
+        remaining = None
+        if expires is not None:
+            remaining = expires - time()
+            if remaining <= 0:
+                self.delete(key)
+                return _MISSING
+        return pickle.loads(blob), len(blob), remaining
+
+    def set(self, key, blob, ttl):
+        expires = time() + ttl if ttl is not None else None
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?)',
+                         (self.namespace, key, blob, expires))
+        # 여러 스레드가 세어도 정리 주기가 조금 달라질 뿐이므로 잠그지 않는다.
+        self._writes += 1
+        if self._writes >= self.PRUNE_EVERY:
+            self._writes = 0
+            self.prune()
+
+    def prune(self):
+        """만료된 행을 지우고, maxsize가 있으면 오래 전에 쓴 행부터 지워 행 수를 maxsize 이하로 만든다."""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM memo WHERE ns = ? AND expires <= ?', (self.namespace, time()))
+            if self.maxsize is not None:
+                (count,) = conn.execute('SELECT COUNT(*) FROM memo WHERE ns = ?', (self.namespace,)).fetchone()
+                if count > self.maxsize:
+                    conn.execute('DELETE FROM memo WHERE rowid IN ('
+                                 'SELECT rowid FROM memo WHERE ns = ? ORDER BY rowid LIMIT ?)',
+                                 (self.namespace, count - self.maxsize))
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM memo WHERE ns = ? AND key = ?', (self.namespace, key))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM memo WHERE ns = ?', (self.namespace,))
+
+
+class _Cache:
+    """memoize()가 만드는 캐시 본체. 메모리 LRU 계층 + 선택적인 디스크 계층."""
+
+    def __init__(self, func, maxsize, typed, ttl, max_bytes, path, disk_maxsize):
+        self.func = func
+        self.maxsize = maxsize
+        self.typed = typed
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        namespace = '{}.{}'.format(func.__module__, func.__qualname__)
+        self.disk = DiskTier(path, namespace, disk_maxsize) if path is not None else None
+
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self._flights = {}
+        self._tasks = {}  # asyncio 용: (loop, key) -> 계산 중인 Task
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+        self.currbytes = 0
+        self.miss_time = 0.0
+
+    # 메모리 계층
+    def _memory_get(self, key):
+        # self._lock을 잡은 상태에서 부른다.
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        if entry.expires is not None and entry.expires <= monotonic():
+            self._discard(key)
+            return _MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def lookup(self, key):
+        with self._lock:
+            value = self._memory_get(key)
+        if value is not _MISSING or self.disk is None:
+            return value
+        return self.disk_lookup(key)
+
+    def disk_lookup(self, key):
+        found = self.disk.get(self._disk_key(key))
+        if found is _MISSING:
+            return _MISSING
+        value, nbytes, remaining = found
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+        # 메모리 항목은 디스크 항목이 만료될 때 함께 만료된다. (다른 프로세스가 계산한 값이라도)
+        ttl = self.ttl
+        if remaining is not None:
+            ttl = remaining if ttl is None else min(ttl, remaining)
+        self._store(key, value, nbytes, ttl)
+        return value
+
+    def _discard(self, key):
+        entry = self._data.pop(key)
+        self.currbytes -= entry.nbytes
+
+    def _store(self, key, value, nbytes, ttl):
+        if self.maxsize == 0:
+            return
+        if self.max_bytes is None:
+            nbytes = 0
+        elif nbytes > self.max_bytes:
+            # 혼자서 한도를 넘는 값은 메모리에 두지 않는다.
+            return
+        expires = monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+            self._data[key] = _Entry(value, expires, nbytes)
+            self.currbytes += nbytes
+            # 가장 오래 사용하지 않은 항목부터 버린다.
+            while ((self.maxsize is not None and len(self._data) > self.maxsize) or
+                   (self.max_bytes is not None and self.currbytes > self.max_bytes)):
+                oldest = next(iter(self._data))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def _disk_key(self, key):
+        return pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+
+    def record(self, key, value, elapsed):
+        blob = None
+        if self.disk is not None or self.max_bytes is not None:
+            try:
+                blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                # pickle할 수 없는 값(잠금, 제너레이터 등) 때문에 성공한 호출이 실패하면 안 된다.
+                # 메모리 계층에만 두고 크기 계산과 디스크 쓰기는 건너뛴다.
+                blob = None
+        with self._lock:
+            self.misses += 1
+            self.miss_time += elapsed
+        self._store(key, value, len(blob) if blob is not None else 0, self.ttl)
+        if self.disk is not None and blob is not None:
+            self.disk.set(self._disk_key(key), blob, self.ttl)
+
+    # 스레드용 single-flight
+    def call(self, args, kwargs):
+        key = _make_key(args, kwargs, self.typed)
+        value = self.lookup(key)
+        if value is not _MISSING:
+            return value
+
+        me = threading.get_ident()
+        with self._lock:
+            # lookup()과 잠금 사이에 리더가 계산을 끝내고 flight를 지웠을 수 있으므로 잠금 안에서 다시 확인한다.
+            # (그렇지 않으면 이 호출이 새 리더가 되어 같은 값을 다시 계산한다.)
+            value = self._memory_get(key)
+            if value is not _MISSING:
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(me)
+        if not leader:
+            if flight.owner == me:
+                # 같은 스레드에서 같은 키로 재귀 호출하면 기다리지 않고 직접 계산한다.
+                return self.func(*args, **kwargs)
+            flight.event.wait()
+            if flight.exc is not None:
+                raise flight.exc
+            return flight.value
+
+        try:
+            start = perf_counter()
+            value = self.func(*args, **kwargs)
+            self.record(key, value, perf_counter() - start)
+            flight.value = value
+            return value
+        except BaseException as exc:
+            # 예외는 캐시하지 않고 기다리던 호출자들에게만 전달한다.
+            flight.exc = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    # asyncio용 single-flight
+    async def acall(self, args, kwargs):
+        import asyncio  # 코루틴을 데커레이트했다면 이미 로딩되어 있다.
+        key = _make_key(args, kwargs, self.typed)
+        with self._lock:
+            value = self._memory_get(key)
+        if value is not _MISSING:
+            return value
+        loop = asyncio.get_running_loop()
+        if self.disk is not None:
+            # sqlite 읽기는 블로킹 I/O이므로 이벤트 루프 밖에서 한다.
+            value = await loop.run_in_executor(None, self.disk_lookup, key)
+            if value is not _MISSING:
+                return value
+
+        task_key = (id(loop), key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            # 계산은 처음 호출한 쪽의 태스크가 아니라 별도 태스크에서 한다.
+            task = self._tasks[task_key] = asyncio.ensure_future(self._acompute(key, args, kwargs, task_key))
+            task.add_done_callback(_retrieve_exception)
+        # shield: 처음 호출한 쪽을 포함해 기다리던 태스크 하나가 취소되어도 공유된 계산은 계속되고,
+        # 나머지 호출자들은 결과를 받는다.
+        return await asyncio.shield(task)
+
+    async def _acompute(self, key, args, kwargs, task_key):
+        import asyncio
+        try:
+            start = perf_counter()
+            value = await self.func(*args, **kwargs)
+            elapsed = perf_counter() - start
+            if self.disk is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.record, key, value, elapsed)
+            else:
+                self.record(key, value, elapsed)
+            return value
+        finally:
+            # 예외는 캐시하지 않는다. 기다리던 호출자들에게만 전달된다.
+            del self._tasks[task_key]
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def stats(self):
+        with self._lock:
+            avg = self.miss_time / self.misses if self.misses else 0.0
+            return CacheStats(self.hits, self.misses, self.disk_hits, self.evictions,
+                              len(self._data), self.currbytes, self.miss_time, avg)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.disk_hits = self.evictions = 0
+            self.currbytes = 0
+            self.miss_time = 0.0
+        if self.disk is not None:
+            self.disk.clear()
+
+
+def memoize(maxsize=128, typed=False, ttl=None, max_bytes=None, path=None, disk_maxsize=None):
+    """
+    lru_cache와 같은 방식으로 사용하는 메모이제이션 데커레이터.
+    maxsize=None이면 항목 수 제한이 없다.
+    ttl: 항목의 유효 시간(초), max_bytes: 메모리 계층의 최대 크기(바이트)
+    path: sqlite 파일 경로. 주어지면 디스크 계층을 사용한다. pickle할 수 없는 값은 디스크에 쓰지 않는다.
+    disk_maxsize: 디스크 계층의 최대 행 수 (함수마다). None이면 만료된 행만 지운다.
+    코루틴 함수를 데커레이트하면 await 가능한 함수를 돌려준다.
+    """
+    # lru_cache처럼 괄호 없이 @memoize 로도 쓸 수 있게 한다.
+    if callable(maxsize) and not isinstance(maxsize, int):
+        return memoize()(maxsize)
+
+    def decorate(func):
+        cache = _Cache(func, maxsize, typed, ttl, max_bytes, path, disk_maxsize)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def memoized(*args, **kwargs):
+                return await cache.acall(args, kwargs)
+        else:
+            @functools.wraps(func)
+            def memoized(*args, **kwargs):
+                return cache.call(args, kwargs)
+
+        memoized.cache_info = cache.info
+        memoized.cache_clear = cache.clear
+        memoized.cache_stats = cache.stats
+        return memoized
+
+    return decorate
+
+
+if __name__ == '__main__':
+    import asyncio
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from time import sleep
+
+    # lru_cache 대신 memoize 사용하기
+    @memoize()
+    def fibonacci(n):
+        if n < 2:
+            return n
+        return fibonacci(n-2) + fibonacci(n-1)
+
+    print(fibonacci(30))
+    print(fibonacci.cache_info())    # CacheInfo(hits=28, misses=31, maxsize=128, currsize=31)
+
+    # single-flight: 8개 스레드가 같은 키를 동시에 요청해도 한 번만 계산한다.
+    calls = []
+
+    @memoize(ttl=60)
+    def slow_square(x):
+        calls.append(x)
+        sleep(0.2)
+        return x * x
+
+    with ThreadPoolExecutor(8) as pool:
+        print(list(pool.map(slow_square, [3] * 8)))
+    print(len(calls))    # 1
+
+    # asyncio 태스크도 마찬가지
+    @memoize()
+    async def slow_cube(x):
+        calls.append(x)
+        await asyncio.sleep(0.2)
+        return x ** 3
+
+    async def main():
+        return await asyncio.gather(*(slow_cube(2) for _ in range(8)))
+
+    print(asyncio.run(main()))
+    print(len(calls))    # 2
+
+    # 디스크 계층: 새로 데커레이트한(=재시작한 프로세스와 같은) 함수도 sqlite 파일에서 값을 읽어 온다.
+    def squares(n):
+        return [i * i for i in range(n)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'memo.sqlite')
+        memoize(path=path, max_bytes=1 << 20)(squares)(1000)
+
+        restarted = memoize(path=path, max_bytes=1 << 20)(squares)
+        restarted(1000)
+        print(restarted.cache_stats())    # disk_hits=1
@@ -0,0 +1,276 @@
+# clock/timefn 확장: 메모리 할당과 호출 스택 프로파일링
+"""
+clock, timefn은 경과 시간만 잰다.
+mcc_by_avt처럼 열을 추가하고 마스크로 DataFrame을 여러 번 복사하는 함수는 시간 대부분이 할당에서 나온다.
+
+Profiler는 tracemalloc과 cProfile로 호출마다 다음을 기록한다.
+- 경과 시간 (모든 호출. 표본 호출은 측정 때문에 느려지므로 호출당 시간은 나머지 호출로 계산한다.)
+- 최대 메모리(peak), 순 할당량(net), 할당이 많은 코드 위치 top N (표본 호출만)
+- cProfile 호출 스택 통계 (표본 호출만, 라벨별로 누적)
+
+tracemalloc과 cProfile은 켜져 있는 동안 프로그램을 몇 배 느리게 만든다.
+sample_rate 비율의 호출만 자세히 기록하고, 나머지 호출은 perf_counter로 시간만 재므로 운영 환경에서도 쓸 수 있다.
+표본 추출에는 Profiler마다 따로 만든 random.Random을 쓰므로 프로그램의 random 모듈 시퀀스(random.seed)는 바뀌지 않는다.
+
+주의: tracemalloc은 프로세스 전체의 할당을 추적하고 스레드를 구분하지 않는다.
+표본 구간이 실행되는 동안 다른 스레드가 할당하면 그 할당도 peak, net, 할당 위치에 섞여 들어간다.
+(cProfile은 구간을 시작한 스레드만 기록한다.) 멀티스레드 프로그램에서는 메모리 수치를 상한으로 읽어야 한다.
+
+    profiler = Profiler(sample_rate=0.05)
+
+    @profiler.profile
+    def mcc_by_avt(...): ...
+
+    with profiler.section('load'):
+        ...
+
+    print(profiler.report())
+"""
+import contextlib
+import cProfile
+import dis
+import functools
+import io
+import linecache
+import pstats
+import random
+import threading
+import tracemalloc
+from time import perf_counter
+
+
+class _Stats:
+    __slots__ = ('calls', 'sampled', 'time', 'sampled_time', 'peak', 'net', 'sites', 'pstats')
+
+    def __init__(self):
+        self.calls = 0
+        self.sampled = 0
+        self.time = 0.0          # 표본이 아닌 호출들의 경과 시간 합
+        self.sampled_time = 0.0  # 표본 호출들의 경과 시간 합 (tracemalloc/cProfile 때문에 몇 배 길다.)
+        self.peak = 0     # 표본 호출 중 가장 큰 peak
+        self.net = 0      # 표본 호출들의 순 할당량 합
+        self.sites = {}   # (파일, 줄) -> 할당 바이트 합
+        self.pstats = None
+
+    def per_call(self):
+        """호출당 시간. 표본이 아닌 호출이 있으면 그 호출들로만 계산한다."""
+        timed = self.calls - self.sampled
+        if timed:
+            return self.time / timed
+        return self.sampled_time / self.sampled if self.sampled else 0.0
+
+
+# tracemalloc/cProfile은 프로세스 전역이므로 Profiler 객체가 여러 개여도 한 번에 한 구간만 자세히 기록한다.
+_busy = threading.Lock()
+
+
+class _Sample:
+    __slots__ = ('started_tracing', 'before', 'base', 'prof')
+
+
+class Profiler:
+    """
+    sample_rate: 자세히 기록할 호출의 비율 (0~1)
+    top_sites: 호출마다 기록할 할당 위치 수
+    frames: tracemalloc이 저장할 스택 깊이. 깊을수록 느리다.
+    """
+
+    def __init__(self, sample_rate=1.0, top_sites=10, frames=1, cprofile=True):
+        self.sample_rate = sample_rate
+        self.top_sites = top_sites
+        self.frames = frames
+        self.cprofile = cprofile
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def _get(self, label):
+        with self._lock:
+            stats = self._stats.get(label)
+            if stats is None:
+                stats = self._stats[label] = _Stats()
+            return stats
+
+    @contextlib.contextmanager
+    def section(self, label):
+        """with 문 또는 데커레이터로 쓸 수 있는 측정 구간"""
+        sample = None
+        if self._random.random() < self.sample_rate and _busy.acquire(blocking=False):
+            try:
+                sample = self._start_sample()
+            except Exception:
+                # 다른 도구가 tracemalloc/프로파일러를 쓰고 있는 등 준비에 실패하면 시간만 잰다.
+                _busy.release()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            if sample is None:
+                stats = self._get(label)
+                with self._lock:
+                    stats.calls += 1
+                    stats.time += elapsed
+            else:
+                self._finish_sample(label, elapsed, sample)
+
+    def _start_sample(self):
+        sample = _Sample()
+        sample.started_tracing = not tracemalloc.is_tracing()
+        sample.prof = None
+        if sample.started_tracing:
+            tracemalloc.start(self.frames)
+        try:
+            if hasattr(tracemalloc, 'reset_peak'):  # 3.9+
+                tracemalloc.reset_peak()
+            sample.before = tracemalloc.take_snapshot()
+            sample.base, _ = tracemalloc.get_traced_memory()
+            if self.cprofile:
+                sample.prof = cProfile.Profile()
+                sample.prof.enable()
+        except Exception:
+            if sample.started_tracing:
+                tracemalloc.stop()
+            raise
+        return sample
+
+    def _finish_sample(self, label, elapsed, sample):
+        # 프로파일러 쪽에서 실패해도 감싼 함수의 결과나 예외에는 영향을 주지 않는다. 그 표본만 버린다.
+        try:
+            if sample.prof is not None:
+                sample.prof.disable()
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            self._record_sample(label, elapsed, peak - sample.base, current - sample.base,
+                                sample.before, after, sample.prof)
+        except Exception:
+            pass
+        finally:
+            if sample.started_tracing:
+                tracemalloc.stop()
+            _busy.release()
+
+    def _record_sample(self, label, elapsed, peak, net, before, after, prof):
+        # tracemalloc, contextmanager와 이 모듈의 측정 코드 자체의 할당은 빼고 비교한다.
+        # 같은 파일의 다른 줄(예: 아래 데모 함수)은 남겨야 하므로 이 파일은 줄 단위로 뺀다.
+        # (tracemalloc.Filter는 추적마다 fnmatch를 하므로 줄마다 Filter를 만들면 매우 느리다.)
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, contextlib.__file__)]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        sites = []
+        for stat in diff:
+            if len(sites) == self.top_sites:
+                break
+            frame = stat.traceback[0]
+            if stat.size_diff <= 0 or (frame.lineno in _OWN_LINES and frame.filename == __file__):
+                continue
+            sites.append(((frame.filename, frame.lineno), stat.size_diff))
+        stats = self._get(label)
+        with self._lock:
+            stats.calls += 1
+            stats.sampled += 1
+            stats.sampled_time += elapsed
+            stats.peak = max(stats.peak, peak)
+            stats.net += net
+            for site, size in sites:
+                stats.sites[site] = stats.sites.get(site, 0) + size
+            if prof is not None:
+                if stats.pstats is None:
+                    stats.pstats = pstats.Stats(prof, stream=io.StringIO())
+                else:
+                    stats.pstats.add(prof)
+
+    def profile(self, func=None, label=None):
+        """@profiler.profile 또는 @profiler.profile(label='...')"""
+        if func is None:
+            return functools.partial(self.profile, label=label)
+        label = label or func.__qualname__
+
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            with self.section(label):
+                return func(*args, **kwargs)
+        return profiled
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+    def stats(self):
+        """
+        라벨 -> dict(calls, sampled, time, sampled_time, per_call, peak, net, sites)
+        time은 표본이 아닌 호출들의 시간 합, per_call은 그 호출들의 평균이다. (모든 호출이 표본이면 표본 평균)
+        """
+        with self._lock:
+            return {label: {'calls': s.calls, 'sampled': s.sampled, 'time': s.time,
+                            'sampled_time': s.sampled_time, 'per_call': s.per_call(),
+                            'peak': s.peak, 'net': s.net, 'sites': dict(s.sites)}
+                    for label, s in self._stats.items()}
+
+    def report(self, top=10):
+        """시간 순위, 메모리 순위, 할당 위치, cProfile 누적 시간 상위 함수를 문자열로 만든다."""
+        with self._lock:
+            items = list(self._stats.items())
+        out = io.StringIO()
+
+        # 표본 호출은 측정 때문에 느려지므로, 총 시간은 표본이 아닌 호출의 평균 * 전체 호출 수로 추정한다.
+        out.write('== time ==\n')
+        out.write('{:<40} {:>8} {:>8} {:>14} {:>12} {:>16}\n'.format(
+            'label', 'calls', 'sampled', 'est. total(s)', 'per call(ms)', 'sampled/call(ms)'))
+        for label, s in sorted(items, key=lambda item: item[1].per_call() * item[1].calls, reverse=True)[:top]:
+            out.write('{:<40} {:>8} {:>8} {:>14.4f} {:>12.3f} {:>16.3f}\n'.format(
+                label, s.calls, s.sampled, s.per_call() * s.calls, s.per_call() * 1000,
+                s.sampled_time / s.sampled * 1000 if s.sampled else 0.0))
+
+        out.write('\n== memory (sampled calls) ==\n')
+        out.write('{:<40} {:>14} {:>14}\n'.format('label', 'max peak(B)', 'net/call(B)'))
+        sampled = [item for item in items if item[1].sampled]
+        for label, s in sorted(sampled, key=lambda item: item[1].peak, reverse=True)[:top]:
+            out.write('{:<40} {:>14,} {:>14,.0f}\n'.format(label, s.peak, s.net / s.sampled))
+
+        out.write('\n== allocation sites ==\n')
+        sites = {}
+        for label, s in sampled:
+            for site, size in s.sites.items():
+                sites[(label,) + site] = sites.get((label,) + site, 0) + size
+        for (label, filename, lineno), size in sorted(sites.items(), key=lambda item: item[1], reverse=True)[:top]:
+            line = linecache.getline(filename, lineno).strip()
+            out.write('{:>14,}B  {} {}:{}  {}\n'.format(size, label, filename, lineno, line))
+
+        for label, s in items:
+            if s.pstats is None:
+                continue
+            out.write('\n== hot paths: {} ==\n'.format(label))
+            s.pstats.stream = out
+            s.pstats.sort_stats('cumulative').print_stats(top)
+        return out.getvalue()
+
+
+# section의 준비/정리 코드가 있는 줄들 (할당 위치에서 뺀다.)
+_OWN_LINES = frozenset(lineno
+                       for func in (Profiler.section.__wrapped__, Profiler._start_sample, Profiler._finish_sample)
+                       for _, lineno in dis.findlinestarts(func.__code__) if lineno)
+
+
+if __name__ == '__main__':
+    profiler = Profiler(sample_rate=0.2)
+
+    @profiler.profile
+    def build_rows(n):
+        return [{'mcc': str(1100 + i % 15), 'amt': i} for i in range(n)]
+
+    @profiler.profile
+    def group_sum(rows):
+        out = {}
+        for row in rows:
+            key = row['mcc'][0:2]
+            out[key] = out.get(key, 0) + row['amt']
+        return out
+
+    for _ in range(50):
+        group_sum(build_rows(20000))
+
+    with profiler.section('sorted'):
+        sorted(str(i) for i in range(100000))
+
+    print(profiler.report(top=5))
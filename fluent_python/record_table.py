@@ -0,0 +1,313 @@
+# 2.3.4 네임드 튜플, 3.9.3 확장: 열 단위(columnar) 레코드 테이블
+"""
+네임드 튜플의 리스트는 dict의 리스트보다 메모리를 적게 쓰지만,
+레코드 하나마다 튜플 객체(필드 4개면 약 72바이트) + 박싱된 필드 객체들이 따로 생긴다.
+
+record_table()은 네임드 튜플과 같은 방식으로 필드를 받아 RecordTable 클래스를 만든다.
+- 각 필드를 자기만의 array(typecode) 열에 저장한다. (struct-of-arrays)
+- 반복하거나 인덱싱할 때만 네임드 튜플 행을 만든다.
+- where/sort_by/group_by는 열 단위로 처리하고 인덱스 배열만 주고받는다.
+  NumPy가 있으면 숫자 열을 ndarray 뷰로 보고 정렬, 그룹, 행 모으기(take)를 벡터화한다.
+- where(name, predicate)는 환경과 관계없이 값 하나씩 predicate에 넘긴다.
+  열 전체에 대한 벡터 조건은 where_mask(name, vector_predicate)를 쓴다.
+
+typecode 'O'는 array가 지원하지 않는 일반 객체 열(문자열, 튜플 등)을 뜻하며 list에 저장한다.
+"""
+import sys
+from array import array
+from collections import namedtuple
+from itertools import compress
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OBJECT = 'O'
+
+
+def _parse_fields(fields):
+    # namedtuple처럼 'name:d country:O' 문자열이나 [(name, typecode), ...]를 받는다.
+    # 타입을 생략한 필드는 객체 열이 된다.
+    if isinstance(fields, str):
+        fields = fields.replace(',', ' ').split()
+    spec = []
+    for field in fields:
+        if isinstance(field, str):
+            name, _, typecode = field.partition(':')
+        else:
+            name, typecode = field
+        spec.append((name, typecode or OBJECT))
+    return spec
+
+
+def record_table(typename, fields):
+    """
+    네임드 튜플 대신 쓸 수 있는 열 기반 테이블 클래스를 만든다.
+
+    >>> Cities = record_table('Cities', 'name country population:d lat:d lon:d')
+    >>> t = Cities([('Tokyo', 'JP', 36.933, 35.6, 139.7)])
+    >>> t[0].population
+    36.933
+    """
+    spec = _parse_fields(fields)
+    row_type = namedtuple(typename + 'Row', [name for name, _ in spec])
+    return type(typename, (RecordTable,), {'Row': row_type, 'spec': tuple(spec)})
+
+
+class RecordTable:
+    Row = None
+    spec = ()
+
+    def __init__(self, rows=(), _columns=None):
+        if _columns is not None:
+            self._columns = _columns
+            return
+        self._columns = {name: self._new_column(typecode) for name, typecode in self.spec}
+        self.extend(rows)
+
+    @staticmethod
+    def _new_column(typecode):
+        return [] if typecode == OBJECT else array(typecode)
+
+    @classmethod
+    def from_columns(cls, **columns):
+        """열 이름 -> 값들의 반복형으로 테이블을 만든다."""
+        cols = {}
+        for name, typecode in cls.spec:
+            values = columns[name]
+            cols[name] = list(values) if typecode == OBJECT else array(typecode, values)
+        lengths = {len(c) for c in cols.values()}
+        if len(lengths) > 1:
+            raise ValueError('columns have different lengths')
+        return cls(_columns=cols)
+
+    # 시퀀스 프로토콜
+    def __len__(self):
+        if not self.spec:
+            return 0
+        return len(self._columns[self.spec[0][0]])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(range(*index.indices(len(self))))
+        return self.Row._make(col[index] for col in self._columns.values())
+
+    def __iter__(self):
+        # 열들을 zip해서 한 번에 한 행씩만 만든다.
+        make = self.Row._make
+        for values in zip(*self._columns.values()):
+            yield make(values)
+
+    def __repr__(self):
+        return '<{} with {} rows>'.format(type(self).__name__, len(self))
+
+    def append(self, row):
+        if len(row) != len(self.spec):
+            raise TypeError('expected {} fields, got {}'.format(len(self.spec), len(row)))
+        appended = 0
+        try:
+            for col, value in zip(self._columns.values(), row):
+                col.append(value)
+                appended += 1
+        except Exception:
+            # 중간 필드에서 실패하면(타입이 맞지 않는 값, 뷰가 살아 있는 열의 BufferError 등)
+            # 이미 넣은 열들에서 값을 빼서 열 길이가 같게 유지한다.
+            for col in list(self._columns.values())[:appended]:
+                col.pop()
+            raise
+
+    def extend(self, rows):
+        """행마다 append한다. 잘못된 행에서 예외가 나면 그 앞의 행들은 들어간 상태로 남는다. (list.extend와 같음)"""
+        for row in rows:
+            self.append(row)
+
+    def _view(self, name):
+        # 내부 연산용 복사 없는 뷰. 뷰가 살아 있는 동안 array는 버퍼를 빌려준 상태라 크기를 바꿀 수 없으므로
+        # 연산이 끝나면 버리고 밖으로 돌려주지 않는다.
+        col = self._columns[name]
+        if np is not None and isinstance(col, array):
+            return np.frombuffer(col, dtype=col.typecode) if len(col) else np.array([], dtype=col.typecode)
+        return col
+
+    def column(self, name, copy=True):
+        """
+        열 하나의 복사본. NumPy가 있고 숫자 열이면 ndarray, 아니면 array 또는 list이다.
+        copy=False면 NumPy 숫자 열은 복사 없는 ndarray 뷰를 돌려준다.
+        이 뷰가 살아 있는 동안에는 append/extend가 BufferError를 낸다. (array가 버퍼를 빌려준 상태)
+        """
+        col = self._view(name)
+        if not copy and np is not None and isinstance(col, np.ndarray):
+            return col
+        return col.copy() if np is not None and isinstance(col, np.ndarray) else col[:]
+
+    # 열 단위 연산
+    def take(self, indices):
+        """주어진 행 번호들만 모은 새 테이블"""
+        cols = {}
+        if np is not None:
+            # 모으기를 C에서 한다. 숫자 열은 바이트 그대로 새 array로 옮긴다.
+            idx = np.asarray(indices if hasattr(indices, '__len__') else list(indices), dtype=np.intp)
+            positions = None
+            for name, typecode in self.spec:
+                col = self._columns[name]
+                if typecode != OBJECT:
+                    cols[name] = array(typecode, np.take(self._view(name), idx).tobytes())
+                elif len(idx) * 4 >= len(col):
+                    # 많이 모을 때는 참조들을 object ndarray로 옮겨 모은 뒤 list로 만드는 것이 2배 정도 빠르다.
+                    # np.array(col)은 튜플 원소를 2차원으로 펼치므로 fromiter를 쓴다.
+                    refs = np.fromiter(col, dtype=object, count=len(col))
+                    cols[name] = refs.take(idx).tolist()
+                else:
+                    if positions is None:
+                        positions = idx.tolist()
+                    cols[name] = [col[i] for i in positions]
+            return type(self)(_columns=cols)
+        indices = list(indices)
+        for name, typecode in self.spec:
+            col = self._columns[name]
+            if typecode == OBJECT:
+                cols[name] = [col[i] for i in indices]
+            else:
+                cols[name] = array(typecode, [col[i] for i in indices])
+        return type(self)(_columns=cols)
+
+    def _slice(self, start, stop):
+        # 연속된 행들은 열마다 슬라이스 복사 한 번으로 모은다.
+        return type(self)(_columns={name: col[start:stop] for name, col in self._columns.items()})
+
+    def where(self, name, predicate):
+        """열 name의 값을 하나씩 predicate에 넘겨 참인 행들만 남긴다. (예: lambda pop: 10 < pop < 20)"""
+        col = self._columns[name]
+        return self.take(list(compress(range(len(col)), map(predicate, col))))
+
+    def where_mask(self, name, vector_predicate):
+        """
+        열 전체를 vector_predicate에 한 번 넘기고, 돌려받은 불리언 마스크가 참인 행들만 남긴다.
+        NumPy가 있으면 숫자 열은 읽기 전용 ndarray 뷰로 넘어간다. (예: lambda pop: (pop > 10) & (pop < 20))
+        NumPy가 없으면 array/list가 넘어가므로 같은 길이의 불리언 시퀀스를 돌려주어야 한다.
+        넘겨받은 열은 함수가 끝난 뒤 보관하지 않는다.
+        """
+        col = self._view(name)
+        if np is not None:
+            if isinstance(col, np.ndarray):
+                col.flags.writeable = False
+            return self.take(np.flatnonzero(vector_predicate(col)))
+        return self.take(list(compress(range(len(col)), vector_predicate(col))))
+
+    def sort_by(self, name, reverse=False):
+        col = self._view(name)
+        if np is not None and isinstance(col, np.ndarray):
+            if reverse:
+                # sorted(reverse=True)처럼 같은 값은 입력 순서를 유지한다.
+                # 뒤집은 열을 안정 정렬한 결과를 다시 뒤집어 원래 행 번호로 바꾼다.
+                order = len(col) - 1 - np.argsort(col[::-1], kind='stable')[::-1]
+            else:
+                order = np.argsort(col, kind='stable')
+            return self.take(order)
+        # 키 열만 보고 행 번호를 정렬한다. (튜플을 만들지 않는다.)
+        return self.take(sorted(range(len(col)), key=col.__getitem__, reverse=reverse))
+
+    def group_by(self, name):
+        """열 name의 값 -> 그 값을 가진 행들의 테이블"""
+        col = self._view(name)
+        if np is not None:
+            # 값마다 그룹 번호(inverse)를 붙인다.
+            if isinstance(col, np.ndarray):
+                keys, inverse = np.unique(col, return_inverse=True)
+                keys = keys.tolist()
+            else:
+                # 객체 열은 정렬할 수 없는 값도 있으므로 dict로 번호를 붙인다. (처음 나온 순서)
+                codes = {}
+                inverse = np.fromiter((codes.setdefault(value, len(codes)) for value in col),
+                                      dtype=np.intp, count=len(col))
+                keys = list(codes)
+            # 그룹 순서로 한 번에 모은 뒤 그룹 경계에서 자른다.
+            grouped = self.take(np.argsort(inverse, kind='stable'))
+            bounds = np.cumsum(np.bincount(inverse, minlength=len(keys))).tolist()
+            return {key: grouped._slice(start, stop) for key, start, stop in zip(keys, [0] + bounds, bounds)}
+        positions = {}
+        for i, value in enumerate(col):
+            positions.setdefault(value, []).append(i)
+        return {key: self.take(idx) for key, idx in positions.items()}
+
+    def aggregate(self, by, name, func=sum):
+        """group_by 후 열 name에 func를 적용한다. 예: aggregate('country', 'population')"""
+        keys = self._columns[by]
+        values = self._columns[name]
+        groups = {}
+        for key, value in zip(keys, values):
+            groups.setdefault(key, []).append(value)
+        return {key: func(vals) for key, vals in groups.items()}
+
+    def nbytes(self):
+        """열 저장소의 대략적인 크기 (객체 열은 리스트와 원소 객체까지 포함)"""
+        total = 0
+        for col in self._columns.values():
+            if isinstance(col, array):
+                total += sys.getsizeof(col)
+            else:
+                total += sys.getsizeof(col) + sum(sys.getsizeof(v) for v in col)
+        return total
+
+
+if __name__ == '__main__':
+    import random
+    import tracemalloc
+
+    City = namedtuple('City', 'name country population lat lon')
+    Cities = record_table('Cities', 'name country population:d lat:d lon:d')
+
+    t = Cities([('Tokyo', 'JP', 36.933, 35.6, 139.7),
+                ('Delhi', 'IN', 21.935, 28.6, 77.2),
+                ('Mexico City', 'MX', 20.142, 19.4, -99.1)])
+    print(t[0])
+    print(list(t.sort_by('population')))
+    print(list(t.where('population', lambda pop: 20.5 < pop < 30)))
+    if np is not None:
+        print(list(t.where_mask('population', lambda pop: (pop > 20.5) & (pop < 30))))
+
+    # list[City]와 메모리 비교 (tracemalloc으로 실제 할당량을 잰다.)
+    n = 1000000
+    countries = ['JP', 'IN', 'MX', 'KR', 'US']
+    names = ['city{}'.format(i % 1000) for i in range(n)]
+
+    def measure(build):
+        tracemalloc.start()
+        obj = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return obj, size
+
+    cities, list_bytes = measure(lambda: [City(names[i], countries[i % 5], random.random(),
+                                               random.random(), random.random()) for i in range(n)])
+    table, table_bytes = measure(lambda: Cities.from_columns(
+        name=names, country=[countries[i % 5] for i in range(n)],
+        population=(random.random() for _ in range(n)),
+        lat=(random.random() for _ in range(n)), lon=(random.random() for _ in range(n))))
+    # 문자열은 두 경우 모두 공유되므로, 차이는 튜플/float 객체와 열 저장 방식에서 온다.
+    print("list[City]: {:.1f} bytes/record".format(list_bytes / n))
+    print("RecordTable: {:.1f} bytes/record".format(table_bytes / n))
+
+    # 같은 조회를 list[City]와 비교한다.
+    from time import perf_counter
+
+    def timeit(label, func):
+        start = perf_counter()
+        func()
+        print("{}: {:.3f}s".format(label, perf_counter() - start))
+
+    timeit("sorted(list[City])", lambda: sorted(cities, key=lambda c: c.population))
+    timeit("RecordTable.sort_by", lambda: table.sort_by('population'))
+    timeit("list comprehension", lambda: [c for c in cities if 0.2 < c.population < 0.3])
+    timeit("RecordTable.where", lambda: table.where('population', lambda pop: 0.2 < pop < 0.3))
+    if np is not None:
+        timeit("RecordTable.where_mask", lambda: table.where_mask('population', lambda pop: (pop > 0.2) & (pop < 0.3)))
+    def group_cities():
+        groups = {}
+        for c in cities:
+            groups.setdefault(c.country, []).append(c)
+        return groups
+
+    timeit("group_by country (dict of lists)", group_cities)
+    timeit("RecordTable.group_by country", lambda: table.group_by('country'))
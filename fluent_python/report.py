@@ -0,0 +1,53 @@
+# Project: mcc_by_avt와 리포트 함수들
+# 이 모듈을 로딩할 때 pandas와 NumPy도 로딩된다.
+# 예제 데이터는 모듈 로딩 시점이 아니라 make_sample_data()를 호출할 때 만든다.
+import numpy as np
+import pandas as pd
+
+MCC_CODES = ['1101', '1102', '1103', '1201', '1202', '1203', '1301', '1302', '2101',
+             '2102', '2201', '2202', '2203', '2301', '2302']
+AVT_CODES = ['01', '02', '03', '04', '05', '06', '07', '08']
+TRANS_TYPES = ['t-money', 'food', 'electronic', 'drink', 'clothes']
+
+
+def make_sample_data(size=100000):
+    mcc = np.random.choice(MCC_CODES, size=(size, ), replace=True)
+    avt = np.random.choice(AVT_CODES, size=(size, ), replace=True)
+    amt = np.random.randint(low=1000, high=100000, size=(size, ))
+    trans = np.random.choice(TRANS_TYPES, size=(size, ), replace=True)
+    return pd.DataFrame({'mcc': mcc, 'avt': avt, 'amt': amt, 'trans': trans})
+
+
+def mcc_by_avt(data, mcc_col=None, avt_col=None, squeeze=False):
+    if mcc_col is None:
+        mcc_col = set(data['mcc'])
+    if avt_col is None:
+        avt_col = set(data['avt'])
+
+    data['mcc_group'] = [data['mcc'][i][0:2] for i in range(data.shape[0])]
+
+    mask1 = data['mcc'].isin(mcc_col)
+    mask2 = data['avt'].isin(avt_col)
+    masked_data = data[mask1][mask2]
+
+    if squeeze:
+        output = masked_data['amt'].groupby([data['mcc_group'], data['avt']]).size().unstack('mcc_group')
+    else:
+        output = masked_data['amt'].groupby([data['mcc'], data['avt']]).size().unstack('mcc')
+
+    return output
+
+
+def cat_report(data, col='cat'):
+    result = data['amt'].groupby(data[col]).agg(['mean', 'sum'])
+    return result
+
+
+def id_report(data, col='id'):
+    result = data['amt'].groupby(data[col]).agg(['mean', 'sum'])
+    return result
+
+
+def payway_report(data, col):
+    output = data['amt'].groupby([data['payway'], data[col]]).agg(['mean', 'sum'])
+    return output
@@ -0,0 +1,391 @@
+# 2.9.4 덱 확장: 숫자 전용 링 버퍼
+"""
+deque(maxlen=n)은 슬라이딩 윈도우를 만들 때 편하지만,
+- 모든 float을 파이썬 객체로 박싱해서 보관하고
+- 윈도우의 합/평균/최솟값/최댓값을 구하려면 매번 윈도우 전체를 다시 순회해야 한다.
+
+RingBuffer는 고정 크기의 연속된 array(typecode) 하나에 값을 저장한다.
+- append는 O(1), extend(batch)는 슬라이스 복사 최대 2번으로 처리한다.
+- window()는 복사 없이 버퍼를 가리키는 뷰를 돌려준다.
+  윈도우가 배열 끝에서 감겨 있으면(wrap) 뷰 두 개를 돌려준다.
+  NumPy가 설치되어 있으면 뷰는 ndarray, 아니면 memoryview이다.
+- sum/mean은 O(1), min/max는 단조 덱(monotonic deque)을 이용해 분할상환 O(1)이다.
+  NumPy가 있으면 extend의 단조 덱 갱신도 배치 단위로 한다. (뒤쪽 최솟값/최댓값보다 작은/큰 항목만 남는다.)
+- 누적 합계는 Neumaier 보정 합으로 유지한다. 배치의 합은 math.fsum으로 구한다.
+  배치 합을 반올림한 오차의 상한(_err)이 현재 합계에 비해 커지면(크기가 아주 다른 값이 빠져서 상쇄되면)
+  윈도우 전체를 fsum으로 다시 더한다. 예) RingBuffer(3, [1e20, 1, 1]).append(1) 뒤의 sum()은 3.0이다.
+
+append, appendleft, extend, pop, popleft, rotate, clear, len, iter, 인덱싱, maxlen 등 deque의 자주 쓰는 메서드를 지원한다.
+appendleft, pop, rotate는 가장 오래된 항목부터 버려지는 순서를 바꾸므로 단조 덱을 O(maxlen)으로 다시 만든다.
+드물게 쓰는 연산이므로 append/extend/popleft의 분할상환 O(1)은 그대로 유지된다.
+"""
+import math
+from array import array
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 없이도 memoryview로 동작한다.
+    np = None
+
+
+class RingBuffer:
+    RESYNC = 64
+
+    def __init__(self, maxlen, iterable=(), typecode='d', track_minmax=True):
+        if maxlen <= 0:
+            raise ValueError('maxlen must be positive')
+        self._maxlen = maxlen
+        self.typecode = typecode
+        self._data = array(typecode, bytes(array(typecode).itemsize * maxlen))
+        self._mv = memoryview(self._data)
+        # NumPy 뷰는 한 번만 만든다. _data의 크기는 바뀌지 않으므로 안전하다.
+        self._np = np.frombuffer(self._data, dtype=typecode) if np is not None else None
+        # _start: 가장 오래된 항목의 절대 번호, _end: 다음에 들어갈 항목의 절대 번호
+        self._start = 0
+        self._end = 0
+        self._sum = 0
+        self._comp = 0     # Neumaier 보정항. sum()은 _sum + _comp
+        self._err = 0.0    # 마지막으로 다시 더한 뒤 배치 합을 반올림한 오차의 상한
+        self._evicted = 0
+        self._resync_at = maxlen * self.RESYNC
+        # 단조 덱에는 (절대 번호, 값)을 넣는다.
+        self._track = track_minmax
+        self._minq = deque()
+        self._maxq = deque()
+        self.extend(iterable)
+
+    @property
+    def maxlen(self):
+        return self._maxlen
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __bool__(self):
+        return self._end != self._start
+
+    def __getitem__(self, index):
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('ring buffer index out of range')
+        return self._data[(self._start + index) % self._maxlen]
+
+    def __iter__(self):
+        for part in self._parts():
+            yield from part
+
+    def __repr__(self):
+        return '{}({!r}, maxlen={})'.format(type(self).__name__, list(self), self._maxlen)
+
+    def _parts(self):
+        # 윈도우를 버퍼 위의 연속 구간 (최대 2개)으로 나눈다.
+        n = len(self)
+        head = self._start % self._maxlen
+        if head + n <= self._maxlen:
+            return (self._mv[head:head + n],)
+        return (self._mv[head:], self._mv[:head + n - self._maxlen])
+
+    def window(self):
+        """현재 윈도우를 오래된 순서로 가리키는 뷰들의 튜플 (복사 없음)"""
+        if self._np is None:
+            return self._parts()
+        n = len(self)
+        head = self._start % self._maxlen
+        if head + n <= self._maxlen:
+            return (self._np[head:head + n],)
+        return (self._np[head:], self._np[:head + n - self._maxlen])
+
+    def to_array(self):
+        """윈도우를 연속된 새 배열로 복사한다."""
+        if self._np is not None:
+            return np.concatenate(self.window())
+        return self._copy()
+
+    # 추가/삭제
+    def append(self, value):
+        # 틱마다 불리는 경로이므로 _drop(1)을 풀어 쓴다.
+        data, end = self._data, self._end
+        pos = end % self._maxlen
+        if end - self._start == self._maxlen:
+            # pos에 있는 가장 오래된 항목을 버린다.
+            self._add(-data[pos])
+            start = self._start = self._start + 1
+            self._evicted += 1
+            if self._track:
+                minq, maxq = self._minq, self._maxq
+                if minq[0][0] < start:
+                    minq.popleft()
+                if maxq[0][0] < start:
+                    maxq.popleft()
+        data[pos] = value
+        value = data[pos]  # typecode에 맞게 변환된 값
+        self._add(value)
+        if self._track:
+            self._push(end, value)
+        self._end = end + 1
+        if self._evicted >= self._resync_at or self._err:
+            self._maybe_resync()
+
+    def extend(self, iterable):
+        batch = self._as_buffer(iterable)
+        n = len(batch)
+        if n == 0:
+            return
+        if n >= self._maxlen:
+            # 윈도우 전체가 교체된다. 마지막 maxlen개만 남긴다.
+            self._evicted += len(self)
+            skipped = n - self._maxlen
+            batch = batch[skipped:]
+            self._start = self._end = self._end + skipped
+            self._sum = self._comp = 0
+            self._err = 0.0
+            self._minq.clear()
+            self._maxq.clear()
+            n = self._maxlen
+        else:
+            overflow = len(self) + n - self._maxlen
+            if overflow > 0:
+                self._drop(overflow)
+
+        pos = self._end % self._maxlen
+        first = min(n, self._maxlen - pos)
+        self._mv[pos:pos + first] = batch[:first]
+        if first < n:
+            self._mv[:n - first] = batch[first:]
+
+        self._add_batch(batch)
+        if self._track:
+            self._push_batch(self._end, batch)
+        self._end += n
+        self._maybe_resync()
+
+    def appendleft(self, value):
+        # deque와 같이 가득 차 있으면 반대쪽(가장 최근 항목)을 버린다.
+        if len(self) == self._maxlen:
+            self._pop_right()
+        self._start -= 1
+        pos = self._start % self._maxlen
+        self._data[pos] = value
+        self._add(self._data[pos])
+        self._rebuild_minmax()
+        self._maybe_resync()
+
+    def pop(self):
+        value = self._pop_right()
+        self._rebuild_minmax()
+        self._maybe_resync()
+        return value
+
+    def popleft(self):
+        if not self:
+            raise IndexError('pop from an empty ring buffer')
+        value = self._data[self._start % self._maxlen]
+        self._drop(1)
+        self._maybe_resync()
+        return value
+
+    def rotate(self, n=1):
+        """deque.rotate와 같이 오른쪽으로 n칸 돌린다. (n < 0이면 왼쪽)"""
+        if len(self) <= 1:
+            return
+        k = n % len(self)
+        if k == 0:
+            return
+        items = self._copy()
+        self.clear()
+        self.extend(items[-k:] + items[:-k])
+
+    def clear(self):
+        self._start = self._end
+        self._sum = self._comp = 0
+        self._err = 0.0
+        self._evicted = 0
+        self._minq.clear()
+        self._maxq.clear()
+
+    def _copy(self):
+        out = array(self.typecode)
+        for part in self._parts():
+            out.frombytes(part.cast('B'))
+        return out
+
+    def _pop_right(self):
+        if not self:
+            raise IndexError('pop from an empty ring buffer')
+        self._end -= 1
+        value = self._data[self._end % self._maxlen]
+        self._add(-value)
+        return value
+
+    def _rebuild_minmax(self):
+        # 단조 덱을 현재 윈도우로 처음부터 다시 만든다. O(maxlen)
+        if not self._track:
+            return
+        self._minq.clear()
+        self._maxq.clear()
+        for i, value in enumerate(self, self._start):
+            self._push(i, value)
+
+    def _as_buffer(self, iterable):
+        # 배치를 같은 typecode의 연속 버퍼로 만든다. (memoryview 슬라이스 대입에 필요)
+        if self._np is not None:
+            if not hasattr(iterable, '__len__'):
+                # 제너레이터 등 길이를 모르는 반복자는 ascontiguousarray가 받지 않는다. (deque.extend는 받는다.)
+                return memoryview(np.fromiter(iterable, dtype=self._np.dtype))
+            return memoryview(np.ascontiguousarray(iterable, dtype=self._np.dtype))
+        if isinstance(iterable, array) and iterable.typecode == self.typecode:
+            return memoryview(iterable)
+        return memoryview(array(self.typecode, iterable))
+
+    def _batch_sum(self, part):
+        if self.typecode in 'fd':
+            return math.fsum(part)
+        if self._np is not None:
+            return np.frombuffer(part, dtype=self._np.dtype).sum().item()
+        return sum(part)
+
+    def _add(self, value):
+        # Neumaier 보정 합: 큰 값에 작은 값을 더할 때 잃는 비트를 _comp에 모은다. (정수는 _comp가 늘 0이다.)
+        total = self._sum + value
+        if abs(self._sum) >= abs(value):
+            self._comp += (self._sum - total) + value
+        else:
+            self._comp += (value - total) + self._sum
+        self._sum = total
+
+    def _add_batch(self, part, sign=1):
+        total = self._batch_sum(part)
+        if len(part) > 1 and self.typecode in 'fd':
+            # fsum은 정확히 반올림하므로 오차는 결과의 반 ulp 이하이다.
+            self._err += abs(total) * 2.0 ** -53
+        self._add(sign * total)
+
+    def _drop(self, count):
+        # 가장 오래된 count개를 버린다.
+        if count == 1:
+            # 가득 찬 버퍼에 append할 때마다 지나가는 경로이므로 배치 합을 거치지 않는다.
+            self._add(-self._data[self._start % self._maxlen])
+        else:
+            for part in self._head_parts(count):
+                self._add_batch(part, -1)
+        self._start += count
+        self._evicted += count
+        for q in (self._minq, self._maxq):
+            while q and q[0][0] < self._start:
+                q.popleft()
+
+    def _head_parts(self, count):
+        head = self._start % self._maxlen
+        if head + count <= self._maxlen:
+            return (self._mv[head:head + count],)
+        return (self._mv[head:], self._mv[:head + count - self._maxlen])
+
+    def _push(self, index, value):
+        minq, maxq = self._minq, self._maxq
+        while minq and minq[-1][1] >= value:
+            minq.pop()
+        minq.append((index, value))
+        while maxq and maxq[-1][1] <= value:
+            maxq.pop()
+        maxq.append((index, value))
+
+    def _push_batch(self, first, batch):
+        if self._np is None:
+            for i, value in enumerate(batch.tolist(), first):
+                self._push(i, value)
+            return
+        # 배치 안에서는 뒤쪽의 모든 값보다 작은(최솟값 덱) 항목만 남는다.
+        # 뒤에서부터 누적 최솟값/최댓값을 구해 살아남는 항목만 덱에 넣는다.
+        values = np.frombuffer(batch, dtype=self._np.dtype)
+        for q, accumulate, survives in ((self._minq, np.minimum.accumulate, np.less),
+                                        (self._maxq, np.maximum.accumulate, np.greater)):
+            suffix = accumulate(values[::-1])[::-1]
+            extreme = suffix[0].item()
+            while q and not survives(q[-1][1], extreme):
+                q.pop()
+            keep = np.flatnonzero(survives(values[:-1], suffix[1:])).tolist()
+            keep.append(len(values) - 1)
+            q.extend(zip([first + i for i in keep], values[keep].tolist()))
+
+    def _maybe_resync(self):
+        # 누적 덧셈의 부동소수점 오차가 쌓이지 않도록 maxlen * RESYNC개를 버릴 때마다 합계를 다시 계산한다.
+        # 다시 계산하는 비용은 O(maxlen)이므로 분할상환 O(1)이다.
+        # 배치 합의 반올림 오차가 합계에 비해 커지면(상쇄가 일어나면) 그때도 다시 계산한다.
+        if self._evicted >= self._resync_at or self._err > abs(self._sum + self._comp) * 2.0 ** -40:
+            self._evicted = 0
+            self._err = 0.0
+            self._comp = 0
+            if self.typecode in 'fd':
+                self._sum = math.fsum(v for part in self._parts() for v in part)
+            else:
+                self._sum = sum(self._batch_sum(part) for part in self._parts())
+
+    # 롤링 집계
+    def sum(self):
+        return self._sum + self._comp
+
+    def mean(self):
+        if not self:
+            raise ValueError('mean of an empty ring buffer')
+        return self.sum() / len(self)
+
+    def min(self):
+        return self._extreme(self._minq, min)
+
+    def max(self):
+        return self._extreme(self._maxq, max)
+
+    def _extreme(self, q, fallback):
+        if not self:
+            raise ValueError('{}() of an empty ring buffer'.format(fallback.__name__))
+        if self._track:
+            return q[0][1]
+        return fallback(fallback(part) for part in self.window())
+
+
+if __name__ == '__main__':
+    from time import perf_counter
+
+    # deque(range(10), maxlen=10)과 같은 방식으로 사용하기
+    rb = RingBuffer(10, range(10))
+    rb.extend([11, 22, 33])
+    print(rb)
+    print(rb.sum(), rb.mean(), rb.min(), rb.max())
+    print(rb.window())    # 배열 끝에서 감겨 있으므로 뷰 두 개
+
+    # 100만 틱을 1000개씩 배치로 넣으면서 1000개 윈도우의 평균 구하기
+    import random
+    ticks = array('d', (random.random() for _ in range(1000000)))
+
+    start = perf_counter()
+    dq = deque(maxlen=1000)
+    for i in range(0, len(ticks), 1000):
+        dq.extend(ticks[i:i + 1000])
+        mean = sum(dq) / len(dq)
+    print("deque extend + sum: {:.3f}s".format(perf_counter() - start))
+
+    # 기본 설정(track_minmax=True)은 min/max용 단조 덱도 갱신한다.
+    for track in (True, False):
+        start = perf_counter()
+        rb = RingBuffer(1000, track_minmax=track)
+        for i in range(0, len(ticks), 1000):
+            rb.extend(ticks[i:i + 1000])
+            mean = rb.mean()
+        print("RingBuffer extend + mean (track_minmax={}): {:.3f}s".format(track, perf_counter() - start))
+
+    # 한 틱씩 들어오는 경우: 가득 찬 버퍼에 append
+    n = 200000
+    start = perf_counter()
+    dq = deque(maxlen=1000)
+    for tick in ticks[:n]:
+        dq.append(tick)
+    print("deque append x{}: {:.3f}s".format(n, perf_counter() - start))
+    for track in (True, False):
+        start = perf_counter()
+        rb = RingBuffer(1000, track_minmax=track)
+        for tick in ticks[:n]:
+            rb.append(tick)
+        print("RingBuffer append x{} (track_minmax={}): {:.3f}s".format(n, track, perf_counter() - start))
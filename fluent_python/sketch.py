@@ -0,0 +1,379 @@
+# Report 확장: 근사 집계(sketch)로 id/cat 리포트 만들기
+"""
+id_report, cat_report는 키마다 정확한 mean, sum을 구하므로 키 개수만큼 메모리가 든다.
+아주 큰 스트림에서 운영자가 실제로 보고 싶은 것은 다음 세 가지이고, 근사값이면 충분하다.
+
+- 서로 다른 id의 수        -> HyperLogLog
+  레지스터 m = 2^p개 (바이트 m개). 상대 표준오차 약 1.04 / sqrt(m). p=14면 16KB로 약 0.8%
+- 키별 amt 합계           -> Count-Min sketch
+  width = ceil(e / eps), depth = ceil(ln(1 / delta))
+  음수가 없는 값이면 추정값은 항상 실제값 이상이고, 확률 1 - delta 이상으로 실제값 + eps * (전체 합) 이하이다.
+- amt 합계 상위 k개 키     -> Space-Saving
+  카운터 k개. 추정값은 실제값 이상, 실제값 + (전체 합 / k) 이하이다.
+  전체 합의 1/k보다 큰 키는 반드시 카운터 안에 남는다.
+
+모든 스케치는 같은 매개변수끼리 merge()로 합칠 수 있으므로 파티션/워커별로 만든 뒤 합치면 된다.
+bytes()로 직렬화하고 frombytes()로 되살린다. (Vector2d의 __bytes__와 같은 방식)
+해시는 프로세스마다 달라지는 hash() 대신 blake2b를 쓰므로 다른 프로세스에서 만든 스케치와도 합칠 수 있다.
+키는 종류(정수/문자열/바이트/실수/그 밖)를 앞에 붙여 해시하므로 id 1과 '1'은 다른 키이다.
+dict와 같이 ==로 같은 수는 같은 키이다. (1, 1.0, True, numpy.int64(1)은 모두 같은 키)
+"""
+import hashlib
+import heapq
+import itertools
+import math
+import numbers
+import pickle
+import struct
+from array import array
+
+
+def _key_bytes(key):
+    # str(key)만 해시하면 1과 '1'이 같은 키가 되므로 종류를 앞에 붙인다.
+    if isinstance(key, str):
+        return b's' + key.encode('utf-8', 'surrogatepass')
+    if isinstance(key, bytes):
+        return b'b' + key
+    if isinstance(key, numbers.Integral):
+        return b'i' + str(int(key)).encode()
+    if isinstance(key, numbers.Real):
+        key = float(key)
+        # 1.0 == 1이므로 정수값 실수는 정수와 같게 해시한다.
+        if key.is_integer():
+            return b'i' + str(int(key)).encode()
+        return b'f' + repr(key).encode()
+    return '{}:{}'.format(type(key).__qualname__, key).encode()
+
+
+def _hash64(key):
+    return int.from_bytes(hashlib.blake2b(_key_bytes(key), digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    typecode = b'H'
+
+    def __init__(self, p=14):
+        if not 4 <= p <= 18:
+            raise ValueError('p must be between 4 and 18')
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, key):
+        h = _hash64(key)
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        # 나머지 비트에서 처음 1이 나오는 위치 (앞쪽 0의 개수 + 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+        return self
+
+    def __len__(self):
+        return round(self.estimate())
+
+    def estimate(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # 작은 값에서는 linear counting이 더 정확하다.
+            return m * math.log(m / zeros)
+        return raw
+
+    def standard_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError('cannot merge HyperLogLog with different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def __bytes__(self):
+        return self.typecode + bytes([self.p]) + bytes(self.registers)
+
+    @classmethod
+    def frombytes(cls, octets):
+        if octets[:1] != cls.typecode:
+            raise ValueError('not a HyperLogLog')
+        hll = cls(octets[1])
+        hll.registers = bytearray(octets[2:])
+        return hll
+
+
+class CountMinSketch:
+    typecode = b'C'
+    _header = struct.Struct('<II')
+
+    def __init__(self, eps=0.001, delta=0.01, width=None, depth=None):
+        self.width = width or math.ceil(math.e / eps)
+        self.depth = depth or math.ceil(math.log(1 / delta))
+        self.table = array('d', [0.0]) * (self.width * self.depth)
+        self.total = 0.0
+
+    def _columns(self, key):
+        # 64비트 해시 하나를 둘로 나누어 행마다 h1 + i * h2로 서로 다른 해시를 만든다. (Kirsch-Mitzenmacher)
+        h = _hash64(key)
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key, value=1.0):
+        table = self.table
+        for i in self._columns(key):
+            table[i] += value
+        self.total += value
+
+    def update(self, keys, values):
+        for key, value in zip(keys, values):
+            self.add(key, value)
+        return self
+
+    def __getitem__(self, key):
+        table = self.table
+        return min(table[i] for i in self._columns(key))
+
+    def error_bound(self):
+        """확률 1 - delta로 보장되는 추정 오차의 상한: eps * 전체 합"""
+        return math.e / self.width * self.total
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('cannot merge CountMinSketch with different shape')
+        self.table = array('d', map(float.__add__, self.table, other.table))
+        self.total += other.total
+        return self
+
+    def __bytes__(self):
+        return (self.typecode + self._header.pack(self.width, self.depth) +
+                struct.pack('<d', self.total) + bytes(self.table))
+
+    @classmethod
+    def frombytes(cls, octets):
+        if octets[:1] != cls.typecode:
+            raise ValueError('not a CountMinSketch')
+        width, depth = cls._header.unpack_from(octets, 1)
+        offset = 1 + cls._header.size
+        cms = cls(width=width, depth=depth)
+        (cms.total,) = struct.unpack_from('<d', octets, offset)
+        cms.table = array('d')
+        cms.table.frombytes(octets[offset + 8:])
+        return cms
+
+
+class SpaceSaving:
+    """
+    가중치 합 기준 top-k. counters: 키 -> [추정 합, 오차 상한]
+    카운터가 꽉 찬 상태에서 새 키가 오면 가장 작은 카운터를 그 키에게 넘겨준다.
+
+    가장 작은 카운터는 최소 힙 _heap의 (추정 합, 순번, 키)로 찾는다. 키마다 항목이 정확히 하나 있다.
+    이미 있는 키의 합이 늘어날 때는 힙을 고치지 않고(지연 갱신), 최솟값을 꺼낼 때
+    힙에 적힌 값이 현재 값과 다르면 현재 값으로 다시 넣는다. 값이 음수가 아니면 합은 늘기만 하므로
+    다시 넣은 항목 수는 add 호출 수를 넘지 않고, add는 분할상환 O(log k)이다.
+    (순번은 키끼리 비교하지 않도록 넣는다. 키는 순서를 비교할 수 없는 객체일 수 있다.)
+    """
+    typecode = b'S'
+
+    def __init__(self, k=100):
+        self.k = k
+        self.counters = {}
+        self.total = 0.0
+        self._heap = []
+        self._seq = itertools.count()
+
+    def add(self, key, value=1.0):
+        if value < 0:
+            raise ValueError('SpaceSaving needs non-negative values')
+        self.total += value
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += value
+        elif len(self.counters) < self.k:
+            self.counters[key] = [value, 0.0]
+            heapq.heappush(self._heap, (value, next(self._seq), key))
+        else:
+            floor, victim = self._min()
+            del self.counters[victim]
+            self.counters[key] = [floor + value, floor]
+            heapq.heapreplace(self._heap, (floor + value, next(self._seq), key))
+
+    def _min(self):
+        # 힙의 맨 위 항목을 현재 값으로 맞춘 뒤 (가장 작은 추정 합, 그 키)를 돌려준다.
+        heap = self._heap
+        while True:
+            est, _, key = heap[0]
+            current = self.counters[key][0]
+            if est == current:
+                return est, key
+            heapq.heapreplace(heap, (current, next(self._seq), key))
+
+    def _rebuild_heap(self):
+        self._heap = [(counter[0], next(self._seq), key) for key, counter in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def update(self, keys, values):
+        for key, value in zip(keys, values):
+            self.add(key, value)
+        return self
+
+    def _floor(self):
+        # 카운터가 꽉 차 있으면, 카운터에 없는 키의 합은 최솟값 이하이다.
+        if len(self.counters) < self.k:
+            return 0.0
+        return self._min()[0]
+
+    def top(self, n=None):
+        """(키, 추정 합, 오차 상한)을 추정 합이 큰 순서로"""
+        n = n or self.k
+        best = heapq.nlargest(n, self.counters.items(), key=lambda item: item[1][0])
+        return [(key, est, err) for key, (est, err) in best]
+
+    def error_bound(self):
+        return self.total / self.k
+
+    def merge(self, other):
+        # 한쪽에 없는 키는 그쪽의 최솟값만큼 있었을 수 있으므로 추정값과 오차에 더한다.
+        # (Agarwal et al., Mergeable Summaries) 합친 뒤 상위 k개만 남긴다.
+        if other.k != self.k:
+            raise ValueError('cannot merge SpaceSaving with different k')
+        floor_a, floor_b = self._floor(), other._floor()
+        merged = {}
+        for key in set(self.counters) | set(other.counters):
+            est_a, err_a = self.counters.get(key, (floor_a, floor_a))
+            est_b, err_b = other.counters.get(key, (floor_b, floor_b))
+            merged[key] = [est_a + est_b, err_a + err_b]
+        best = heapq.nlargest(self.k, merged.items(), key=lambda item: item[1][0])
+        self.counters = {key: counter for key, counter in best}
+        self._rebuild_heap()
+        self.total += other.total
+        return self
+
+    def __bytes__(self):
+        # 키는 임의의 객체일 수 있으므로 pickle한다. 믿을 수 있는 데이터에만 frombytes를 쓴다.
+        return self.typecode + pickle.dumps((self.k, self.total, self.counters), pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def frombytes(cls, octets):
+        if octets[:1] != cls.typecode:
+            raise ValueError('not a SpaceSaving')
+        k, total, counters = pickle.loads(octets[1:])
+        ss = cls(k)
+        ss.total = total
+        ss.counters = counters
+        ss._rebuild_heap()
+        return ss
+
+
+class SketchReport:
+    """
+    id_report/cat_report의 근사 버전. 한 열(col)에 대해 세 스케치를 함께 갱신한다.
+    distinct(): 서로 다른 키의 수, sum(key): 키의 amt 합, top(n): amt 합 상위 키
+    """
+
+    def __init__(self, p=14, eps=0.001, delta=0.01, k=100):
+        self.hll = HyperLogLog(p)
+        self.cms = CountMinSketch(eps, delta)
+        self.topk = SpaceSaving(k)
+
+    def update(self, keys, amts):
+        keys, amts = list(keys), [float(a) for a in amts]
+        self.hll.update(keys)
+        self.cms.update(keys, amts)
+        self.topk.update(keys, amts)
+        return self
+
+    def distinct(self):
+        return self.hll.estimate()
+
+    def sum(self, key):
+        return self.cms[key]
+
+    def top(self, n=10):
+        return self.topk.top(n)
+
+    def merge(self, other):
+        self.hll.merge(other.hll)
+        self.cms.merge(other.cms)
+        self.topk.merge(other.topk)
+        return self
+
+    def __bytes__(self):
+        parts = [bytes(self.hll), bytes(self.cms), bytes(self.topk)]
+        return b''.join(struct.pack('<I', len(part)) + part for part in parts)
+
+    @classmethod
+    def frombytes(cls, octets):
+        parts = []
+        pos = 0
+        while pos < len(octets):
+            (length,) = struct.unpack_from('<I', octets, pos)
+            parts.append(octets[pos + 4:pos + 4 + length])
+            pos += 4 + length
+        report = cls.__new__(cls)
+        report.hll = HyperLogLog.frombytes(parts[0])
+        report.cms = CountMinSketch.frombytes(parts[1])
+        report.topk = SpaceSaving.frombytes(parts[2])
+        return report
+
+
+def id_report_sketch(data, col='id', **params):
+    """data는 DataFrame 또는 열 이름 -> 값들의 dict"""
+    return SketchReport(**params).update(data[col], data['amt'])
+
+
+def cat_report_sketch(data, col='cat', **params):
+    return SketchReport(**params).update(data[col], data['amt'])
+
+
+if __name__ == '__main__':
+    import random
+
+    # 여러 파티션에서 따로 만든 스케치를 직렬화해서 합친다.
+    n_ids, n_rows, n_parts = 20000, 200000, 4
+    weights = [1 / (i + 1) for i in range(n_ids)]    # 일부 id가 많이 쓰는 분포
+    ids = ['id{}'.format(i) for i in random.choices(range(n_ids), weights, k=n_rows)]
+    amts = [random.randint(1000, 100000) for _ in range(n_rows)]
+
+    parts = []
+    size = n_rows // n_parts
+    for j in range(n_parts):
+        data = {'id': ids[j * size:(j + 1) * size], 'amt': amts[j * size:(j + 1) * size]}
+        parts.append(bytes(id_report_sketch(data)))
+    report = SketchReport.frombytes(parts[0])
+    for octets in parts[1:]:
+        report.merge(SketchReport.frombytes(octets))
+
+    # 정확한 값과 비교 (pandas가 있으면 id_report와 같은 groupby)
+    try:
+        import pandas as pd
+        exact = pd.Series(amts).groupby(pd.Series(ids)).sum().to_dict()
+    except ImportError:
+        exact = {}
+        for key, amt in zip(ids, amts):
+            exact[key] = exact.get(key, 0) + amt
+
+    distinct = report.distinct()
+    print("distinct ids: exact {}, HLL {:.0f} (error {:.2%}, standard error {:.2%})".format(
+        len(exact), distinct, abs(distinct - len(exact)) / len(exact), report.hll.standard_error()))
+
+    bound = report.cms.error_bound()
+    worst = max(report.sum(key) - total for key, total in exact.items())
+    print("Count-Min: worst over-estimate {:.0f}, bound {:.0f}".format(worst, bound))
+
+    true_top = sorted(exact.items(), key=lambda item: item[1], reverse=True)[:10]
+    print("top-10 exact:", [key for key, _ in true_top])
+    print("top-10 sketch:", [key for key, _, _ in report.top(10)])
+    print("serialized size: {} bytes".format(len(bytes(report))))
+
+    # 문서에 적은 오차 범위 확인
+    assert abs(distinct - len(exact)) < 4 * report.hll.standard_error() * len(exact)
+    assert all(report.sum(key) >= total for key, total in exact.items())
+    assert worst <= bound
+    for key, est, err in report.top(100):
+        assert exact[key] <= est <= exact[key] + report.topk.error_bound()
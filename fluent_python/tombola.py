@@ -0,0 +1,200 @@
+# 11.7 ABC의 정의와 사용
+import abc
+import random
+import threading
+
+
+class Tombola(abc.ABC):
+
+    @abc.abstractmethod
+    def load(self, iterable):
+        """iterable의 항목들을 추가한다."""
+
+    @abc.abstractmethod
+    def pick(self):
+        """
+        무작위로 항목을 하나 제거하고 반환한다.
+        객체가 비어 있을 때 이 메서드를 실행하는 "LookupError"가 발생한다.
+        """
+
+    def loaded(self):
+        """
+        최소 한 개의 항목이 있으면 True, 아니면 False를 반환한다.
+        """
+        return bool(self.inspect())
+
+    def inspect(self):
+        """
+        현재 안에 있는 항목들로 구성된 정렬된 튜플을 반환한다.
+        """
+        items = []
+        while True:
+            try:
+                items.append(self.pick())
+            except LookupError:
+                break
+        self.load(items)
+        return tuple(sorted(items))
+
+
+# Tombola 확장: 여러 스레드가 함께 쓰는 Tombola
+# 잠금 하나로 전체를 보호하면 모든 pick이 그 잠금 앞에 줄을 선다.
+# ShardedTombola는 항목들을 n_shards개의 작은 통(shard)에 나누어 담고, 통마다 잠금을 따로 둔다.
+# pick은 무작위 통에서 꺼내고, 그 통이 비어 있거나 다른 스레드가 잡고 있으면 다른 통들을 둘러보며 가져온다. (work stealing)
+
+
+def _random_index(n):
+    # 시작 통 고르기: random.randrange보다 몇 배 빠르고, 통 수 정도의 n에서는 치우침이 무시할 만하다.
+    return int(random.random() * n)
+
+
+class _Shard:
+    __slots__ = ('lock', 'items')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = []
+
+
+class ShardedTombola(Tombola):
+
+    def __init__(self, items=(), n_shards=16):
+        if n_shards < 1:
+            raise ValueError('n_shards must be at least 1, got {!r}'.format(n_shards))
+        self._shards = [_Shard() for _ in range(n_shards)]
+        self.load(items)
+
+    def load(self, iterable):
+        # pick이 통 안에서 무작위로 고르므로 섞을 필요는 없다.
+        # 시작 통을 무작위로 골라 항목 몇 개씩 load해도 통들에 고르게 퍼지게 한다.
+        items = list(iterable)
+        shards = self._shards
+        n = len(shards)
+        offset = _random_index(n)
+        if len(items) == 1:
+            # pick한 항목을 바로 되돌려 놓는 흔한 경우: 슬라이스 없이 통 하나만 잠근다.
+            shard = shards[offset]
+            with shard.lock:
+                shard.items.append(items[0])
+            return
+        for j in range(min(n, len(items))):
+            shard = shards[(offset + j) % n]
+            with shard.lock:
+                shard.items.extend(items[j::n])
+
+    def _pick_from(self, shard, k):
+        # 통 안에서 무작위 위치와 마지막 항목을 바꾼 뒤 pop하면 O(1)이다.
+        with shard.lock:
+            items = shard.items
+            out = []
+            while items and len(out) < k:
+                i = random.randrange(len(items))
+                items[i], items[-1] = items[-1], items[i]
+                out.append(items.pop())
+            return out
+
+    def pick(self):
+        shards = self._shards
+        n = len(shards)
+        start = _random_index(n)
+        # 먼저 기다리지 않고 잡을 수 있는 통에서 꺼낸다. 비어 보이는 통은 잠그지 않고 건너뛴다.
+        for i in range(n):
+            shard = shards[(start + i) % n]
+            if shard.items and shard.lock.acquire(False):
+                try:
+                    items = shard.items
+                    if items:
+                        j = random.randrange(len(items))
+                        items[j], items[-1] = items[-1], items[j]
+                        return items.pop()
+                finally:
+                    shard.lock.release()
+        # 모두 잠겨 있었거나 비어 보였으면 잠금을 기다리며 한 바퀴 더 돈다.
+        # 모든 통이 잠금 아래에서 비어 있을 때만 LookupError가 난다.
+        for i in range(n):
+            item = self._pick_from(shards[(start + i) % n], 1)
+            if item:
+                return item[0]
+        raise LookupError('pick from empty ShardedTombola')
+
+    def pick_many(self, k):
+        """
+        최대 k개를 꺼낸다. 남은 항목이 k개보다 적으면 있는 만큼만 돌려준다.
+        잠금을 통마다 한 번만 잡으므로 pick을 k번 부르는 것보다 빠르다.
+        """
+        n = len(self._shards)
+        start = _random_index(n)
+        out = []
+        for i in range(n):
+            out.extend(self._pick_from(self._shards[(start + i) % n], k - len(out)))
+            if len(out) == k:
+                break
+        return out
+
+    def loaded(self):
+        return any(shard.items for shard in self._shards)
+
+    def inspect(self):
+        # 기본 구현(전부 pick했다가 다시 load)은 다른 스레드와 섞일 수 있으므로 모든 통을 잠그고 읽는다.
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            return tuple(sorted(item for shard in self._shards for item in shard.items))
+        finally:
+            for shard in self._shards:
+                shard.lock.release()
+
+
+class LockedTombola(Tombola):
+    """비교용: 잠금 하나로 보호하는 Tombola"""
+
+    def __init__(self, items=()):
+        self._lock = threading.Lock()
+        self._items = []
+        self.load(items)
+
+    def load(self, iterable):
+        with self._lock:
+            self._items.extend(iterable)
+
+    def pick(self):
+        with self._lock:
+            items = self._items
+            if not items:
+                raise LookupError('pick from empty LockedTombola')
+            i = random.randrange(len(items))
+            items[i], items[-1] = items[-1], items[i]
+            return items.pop()
+
+
+if __name__ == '__main__':
+    from concurrent.futures import ThreadPoolExecutor
+    from time import perf_counter
+
+    t = ShardedTombola(range(10), n_shards=4)
+    print(t.pick_many(3), t.loaded(), t.inspect())
+
+    # 스레드 수에 따른 경합 비교: 스레드마다 pick 후 다시 load하는 것을 반복한다.
+    # CPython에서는 GIL 때문에 잠금 하나도 경합이 적고, 통을 고르는 비용 때문에 ShardedTombola가 더 느릴 수 있다.
+    # 잠금을 잡은 채로 GIL을 놓는 작업이 있거나 GIL이 없는 빌드에서 차이가 난다.
+    # pick_many는 잠금을 통마다 한 번만 잡으므로 GIL이 있어도 빠르다.
+    def worker(tombola, rounds):
+        for _ in range(rounds):
+            tombola.load([tombola.pick()])
+
+    def batch_worker(tombola, rounds):
+        for _ in range(rounds // 10):
+            tombola.load(tombola.pick_many(10))
+
+    rounds_total = 100000
+    for n_threads in (1, 2, 4, 8, 16, 32, 64):
+        cases = [('LockedTombola', LockedTombola(range(10000)), worker),
+                 ('ShardedTombola', ShardedTombola(range(10000), n_shards=64), worker),
+                 ('pick_many(10)', ShardedTombola(range(10000), n_shards=64), batch_worker)]
+        for label, tombola, func in cases:
+            start = perf_counter()
+            with ThreadPoolExecutor(n_threads) as pool:
+                for _ in range(n_threads):
+                    pool.submit(func, tombola, rounds_total // n_threads)
+            elapsed = perf_counter() - start
+            print("{:>2} threads {:<15} {:>10.0f} picks/s".format(n_threads, label, rounds_total / elapsed))
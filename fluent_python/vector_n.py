@@ -0,0 +1,381 @@
+# 1.2 Vector 확장: 지연 계산하는 n차원 벡터
+# (Vector, Vector2d만 쓸 때 NumPy를 로딩하지 않도록 vector.py와 나누어 둔다.)
+import math
+import numbers
+import threading
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Vector의 __add__, __mul__은 연산마다 새 Vector를 만든다.
+# a + b * 3 + c는 중간 결과 Vector 두 개를 만들고 버린다.
+#
+# VectorN은 array('d')에 성분을 저장하고, 산술 연산은 계산하지 않고 VectorExpr 트리만 만든다.
+# 트리는 결과가 필요할 때(evaluate, 반복, abs, ==) 성분별로 한 번에(fused) 계산되며 중간 배열을 만들지 않는다.
+# 트리 모양마다 파이썬 함수(kernel)를 한 번 컴파일해서 캐시한다.
+# +=, *=와 evaluate(out=...)는 기존 버퍼에 결과를 쓰므로 반복문 안에서 배열을 새로 할당하지 않는다.
+#
+# NumPy가 있으면 커널은 성분별 파이썬 루프 대신 out=을 지정한 ufunc 호출들이 된다.
+# a + b * 3은 np.multiply(b, 3, out=t0); np.add(a, t0, out=out)이 된다.
+# 중간 결과 t0 등은 길이별로 스레드마다 한 번 만들어 두고 다시 쓰는 작업 버퍼이다.
+# NumPy가 없으면 순수 파이썬 커널을 쓴다. (중간 배열은 없지만 파이썬 루프이므로 리스트 컴프리헨션보다 느리다.)
+
+_KERNELS = {}
+_NP_UFUNCS = {'+': 'add', '-': 'subtract', '*': 'multiply', '/': 'divide'}
+_local = threading.local()
+
+
+def _scratch(n, count):
+    # 길이 n인 작업 버퍼 count개. 최근에 쓴 길이 몇 개만 남겨 둔다.
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = {}
+    buffers = pool.pop(n, [])
+    while len(buffers) < count:
+        buffers.append(np.empty(n))
+    pool[n] = buffers
+    if len(pool) > 8:
+        del pool[next(iter(pool))]
+    return buffers
+
+
+def _leaf_name(node, vectors, scalars):
+    # 잎(벡터, 스칼라)을 인자 목록에 모으고 커널 안에서 쓸 이름을 돌려준다. 같은 벡터는 한 번만 넣는다.
+    if isinstance(node, VectorN):
+        for i, v in enumerate(vectors):
+            if v is node:
+                return 'x{}'.format(i)
+        vectors.append(node)
+        return 'x{}'.format(len(vectors) - 1)
+    scalars.append(node)
+    return 's{}'.format(len(scalars) - 1)
+
+
+def _emit_numpy(node, vectors, scalars, lines, temps, target=None):
+    # 트리를 ufunc 호출들로 바꾼다. 결과가 담긴 이름을 돌려준다.
+    # 자식의 작업 버퍼는 부모의 결과 버퍼로 다시 쓴다. (성분별 계산이므로 입력과 출력이 같아도 된다.)
+    if not isinstance(node, VectorExpr):
+        return _leaf_name(node, vectors, scalars)
+    left = _emit_numpy(node.left, vectors, scalars, lines, temps)
+    right = None if node.op == 'neg' else _emit_numpy(node.right, vectors, scalars, lines, temps)
+    if target is None:
+        if left.startswith('t'):
+            target = left
+        elif right is not None and right.startswith('t'):
+            target = right
+        else:
+            target = 't{}'.format(temps[0])
+            temps[0] += 1
+    if node.op == 'neg':
+        lines.append('    np.negative({}, out={})'.format(left, target))
+    else:
+        lines.append('    np.{}({}, {}, out={})'.format(_NP_UFUNCS[node.op], left, right, target))
+    return target
+
+
+def _compile_numpy(expr, key, n_vectors, n_scalars, reduce):
+    vectors, scalars, body, temps = [], [], [], [0]
+    if reduce:
+        result = _emit_numpy(expr, vectors, scalars, body, temps)
+    else:
+        _emit_numpy(expr, vectors, scalars, body, temps, target='out')
+    n_temps = temps[0]
+    vs = ['x{}'.format(i) for i in range(n_vectors)]
+    ss = ['s{}'.format(i) for i in range(n_scalars)]
+    lines = ['def kernel(out, scratch, {}):'.format(', '.join(vs + ss))]
+    lines += ['    t{0} = scratch[{0}]'.format(i) for i in range(n_temps)]
+    lines += body
+    lines.append('    return float(np.dot({0}, {0}))'.format(result) if reduce else '    return out')
+    namespace = {'np': np}
+    exec('\n'.join(lines), namespace)
+    kernel = namespace['kernel']
+    kernel.n_temps = n_temps
+    _KERNELS[key] = kernel
+    return kernel
+
+
+def _compile(shape, n_vectors, n_scalars, reduce):
+    key = (shape, n_vectors, n_scalars, reduce)
+    kernel = _KERNELS.get(key)
+    if kernel is not None:
+        return kernel
+    vs = ['v{}'.format(i) for i in range(n_vectors)]
+    xs = ['x{}'.format(i) for i in range(n_vectors)]
+    ss = ['s{}'.format(i) for i in range(n_scalars)]
+    # zip(v0)처럼 인자가 하나면 (x0,)으로 언패킹해야 한다.
+    target = '({},)'.format(xs[0]) if n_vectors == 1 else '({})'.format(', '.join(xs))
+    lines = ['def kernel(out, {}):'.format(', '.join(vs + ss))]
+    if reduce:
+        lines += ['    acc = 0.0',
+                  '    for {} in zip({}):'.format(target, ', '.join(vs)),
+                  '        e = {}'.format(shape),
+                  '        acc += e * e',
+                  '    return acc']
+    else:
+        lines += ['    for i, {} in enumerate(zip({})):'.format(target, ', '.join(vs)),
+                  '        out[i] = {}'.format(shape),
+                  '    return out']
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    kernel = _KERNELS[key] = namespace['kernel']
+    return kernel
+
+
+class _LazyArithmetic:
+    """VectorN과 VectorExpr의 산술 연산자: 계산하지 않고 VectorExpr을 만든다."""
+    __slots__ = ()
+
+    def __add__(self, other):
+        return _binary('+', self, other)
+
+    def __radd__(self, other):
+        return _binary('+', other, self)
+
+    def __sub__(self, other):
+        return _binary('-', self, other)
+
+    def __rsub__(self, other):
+        return _binary('-', other, self)
+
+    def __mul__(self, scalar):
+        return _scale('*', self, scalar)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar):
+        return _scale('/', self, scalar)
+
+    def __neg__(self):
+        return VectorExpr('neg', self)
+
+
+class VectorExpr(_LazyArithmetic):
+    """VectorN들에 대한 아직 계산하지 않은 산술식. 왼쪽 피연산자는 항상 VectorN 또는 VectorExpr이다."""
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op, left, right=None):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def _flatten(self, vectors, scalars):
+        # 트리를 파이썬 식 문자열로 바꾸면서 잎(벡터, 스칼라)을 인자 목록에 모은다.
+        def leaf(node):
+            if isinstance(node, VectorExpr):
+                return node._flatten(vectors, scalars)
+            return _leaf_name(node, vectors, scalars)
+
+        if self.op == 'neg':
+            return '(-{})'.format(leaf(self.left))
+        return '({} {} {})'.format(leaf(self.left), self.op, leaf(self.right))
+
+    def _prepare(self, reduce=False):
+        vectors, scalars = [], []
+        shape = self._flatten(vectors, scalars)
+        n = len(vectors[0])
+        if any(len(v) != n for v in vectors):
+            raise ValueError('vectors have different lengths')
+        if np is not None:
+            key = ('numpy', shape, len(vectors), len(scalars), reduce)
+            kernel = _KERNELS.get(key) or _compile_numpy(self, key, len(vectors), len(scalars), reduce)
+            args = [_scratch(n, kernel.n_temps)] + [v._ndarray() for v in vectors] + scalars
+        else:
+            kernel = _compile(shape, len(vectors), len(scalars), reduce)
+            args = [v._components for v in vectors] + scalars
+        return kernel, n, args
+
+    def evaluate(self, out=None):
+        """식을 한 번에 계산한다. out(VectorN)을 주면 새로 할당하지 않고 그 버퍼에 쓴다."""
+        kernel, n, args = self._prepare()
+        if out is None:
+            out = VectorN.zeros(n)
+        elif len(out) != n:
+            raise ValueError('out has length {}, expected {}'.format(len(out), n))
+        kernel(out._ndarray() if np is not None else out._components, *args)
+        return out
+
+    def __len__(self):
+        node = self
+        while isinstance(node, VectorExpr):
+            node = node.left
+        return len(node)
+
+    def __iter__(self):
+        return iter(self.evaluate())
+
+    def __repr__(self):
+        if self.op == 'neg':
+            return '(-{!r})'.format(self.left)
+        return '({!r} {} {!r})'.format(self.left, self.op, self.right)
+
+    def __eq__(self, other):
+        return _vector_eq(self, other)
+
+    def __abs__(self):
+        # 결과 벡터를 만들지 않고 제곱합을 바로 누적한다.
+        kernel, _, args = self._prepare(reduce=True)
+        return math.sqrt(kernel(None, *args))
+
+    def __bool__(self):
+        return bool(abs(self))
+
+
+def _vector_eq(vector, other):
+    # 길이와 반복을 지원하지 않는 값(숫자 등)과는 비교를 상대에게 넘긴다.
+    if not (hasattr(other, '__len__') and hasattr(other, '__iter__')):
+        return NotImplemented
+    return len(vector) == len(other) and all(a == b for a, b in zip(vector, other))
+
+
+def _binary(op, left, right):
+    if not isinstance(left, (VectorN, VectorExpr)) or not isinstance(right, (VectorN, VectorExpr)):
+        return NotImplemented
+    return VectorExpr(op, left, right)
+
+
+def _scale(op, vector, scalar):
+    if not isinstance(scalar, numbers.Real):
+        return NotImplemented
+    return VectorExpr(op, vector, float(scalar))
+
+
+class VectorN(_LazyArithmetic):
+    typecode = 'd'
+    __slots__ = ('_components', '_view')
+
+    def __init__(self, components):
+        self._components = array(self.typecode, components)
+        self._view = None
+
+    def _ndarray(self):
+        # _components를 가리키는 복사 없는 ndarray. 성분 배열의 크기는 바뀌지 않으므로 한 번 만들어 둔다.
+        if self._view is None:
+            self._view = np.frombuffer(self._components, dtype=self.typecode)
+        return self._view
+
+    @classmethod
+    def zeros(cls, n):
+        vector = cls(())
+        vector._components = array(cls.typecode, bytes(vector._components.itemsize * n))
+        return vector
+
+    def __len__(self):
+        return len(self._components)
+
+    def __iter__(self):
+        return iter(self._components)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return type(self)(self._components[index])
+        return self._components[index]
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self._components))
+
+    def __eq__(self, other):
+        return _vector_eq(self, other)
+
+    def __abs__(self):
+        if np is not None and len(self):
+            view = self._ndarray()
+            return math.sqrt(float(np.dot(view, view)))
+        return math.sqrt(sum(x * x for x in self._components))
+
+    def __bool__(self):
+        return bool(abs(self))
+
+    # 제자리 연산: 자기 버퍼에 결과를 쓴다. (성분별 계산이므로 자기 자신을 읽으면서 써도 안전하다.)
+    def __iadd__(self, other):
+        expr = _binary('+', self, other)
+        if expr is NotImplemented:
+            return NotImplemented
+        expr.evaluate(out=self)
+        return self
+
+    def __isub__(self, other):
+        expr = _binary('-', self, other)
+        if expr is NotImplemented:
+            return NotImplemented
+        expr.evaluate(out=self)
+        return self
+
+    def __imul__(self, scalar):
+        expr = _scale('*', self, scalar)
+        if expr is NotImplemented:
+            return NotImplemented
+        expr.evaluate(out=self)
+        return self
+
+    def __itruediv__(self, scalar):
+        expr = _scale('/', self, scalar)
+        if expr is NotImplemented:
+            return NotImplemented
+        expr.evaluate(out=self)
+        return self
+
+
+if __name__ == '__main__':
+    import tracemalloc
+    from time import perf_counter
+
+    a = VectorN([1, 2, 3])
+    b = VectorN([4, 5, 6])
+    c = VectorN([7, 8, 9])
+    expr = a + b * 3 + c
+    print(expr)               # 아직 계산하지 않은 식
+    print(expr.evaluate())    # VectorN([20.0, 25.0, 30.0])
+    print(abs(a - a))         # 0.0
+
+    # 물리 시뮬레이션 한 스텝: pos += vel * dt, vel += acc * dt
+    n, steps, dt = 1000, 500, 0.01
+    pos = VectorN(range(n))
+    vel = VectorN([1.0] * n)
+    acc = VectorN([-9.8] * n)
+
+    pos += vel * dt    # 커널 컴파일과 캐시를 미리 해 둔다.
+    vel += acc * dt
+    start = perf_counter()
+    for _ in range(steps):
+        pos += vel * dt
+        vel += acc * dt
+    print("VectorN in-place: {:.3f}s".format(perf_counter() - start))
+
+    # 한 스텝 동안 남는 할당이 없는지 tracemalloc으로 확인한다. (Expr 노드 같은 작은 임시 객체만 생긴다.)
+    tracemalloc.start()
+    pos += vel * dt
+    vel += acc * dt
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("one step: current {}B, peak {}B (vector buffer {}B)".format(current, peak, 8 * n))
+
+    # 비교: 연산마다 새 리스트를 만드는 방식
+    # NumPy가 없으면 순수 파이썬 커널의 out[i] 대입이 리스트 컴프리헨션보다 느리다. 대신 스텝마다 새 배열을 할당하지 않는다.
+    pos_list, vel_list, acc_list = list(pos), list(vel), list(acc)
+    start = perf_counter()
+    for _ in range(steps):
+        pos_list = [p + v * dt for p, v in zip(pos_list, vel_list)]
+        vel_list = [v + a * dt for v, a in zip(vel_list, acc_list)]
+    print("new list per step: {:.3f}s".format(perf_counter() - start))
+
+    if np is not None:
+        # 비교: 연산마다 새 ndarray를 만드는 NumPy 식
+        # 작은 벡터에서는 식 트리를 만드는 파이썬 비용이 커서 VectorN이 느리다.
+        # 큰 벡터에서는 계산 시간이 같아지고, VectorN은 스텝마다 새 배열을 할당하지 않는다.
+        for n, steps in ((1000, 500), (1000000, 20)):
+            pos, vel, acc = VectorN(range(n)), VectorN([1.0] * n), VectorN([-9.8] * n)
+            start = perf_counter()
+            for _ in range(steps):
+                pos += vel * dt
+                vel += acc * dt
+            fused = perf_counter() - start
+            pos_np, vel_np, acc_np = np.arange(n, dtype=float), np.ones(n), np.full(n, -9.8)
+            start = perf_counter()
+            for _ in range(steps):
+                pos_np = pos_np + vel_np * dt
+                vel_np = vel_np + acc_np * dt
+            print("n={}: VectorN in-place {:.3f}s, new ndarray per step {:.3f}s".format(
+                n, fused, perf_counter() - start))
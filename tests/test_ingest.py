@@ -0,0 +1,112 @@
+# 레코드 읽기와 Ingestor.run 확인
+import asyncio
+import struct
+
+import pytest
+
+from fluent_python.ingest import AsyncFile, Ingestor, read_length_prefixed, read_lines, write_feed_file
+
+
+class _Reader:
+    """정해진 청크들을 차례로 돌려주는 read(n) 객체"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.reads = 0
+
+    async def read(self, n):
+        self.reads += 1
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+async def _collect(source):
+    out = []
+    async for records in source:
+        out.extend(records)
+    return out
+
+
+def _frames(records):
+    return b''.join(struct.pack('>I', len(r)) + r for r in records)
+
+
+def test_read_length_prefixed_across_chunks():
+    records = [b'a' * n for n in (0, 1, 5, 300)]
+    payload = _frames(records)
+    chunks = [payload[i:i + 7] for i in range(0, len(payload), 7)]
+    assert asyncio.run(_collect(read_length_prefixed(_Reader(chunks)))) == records
+
+
+def test_read_length_prefixed_rejects_oversized_frame_without_buffering():
+    reader = _Reader([struct.pack('>I', 0xFFFFFFF0) + b'x' * 10] + [b'x' * 1000] * 100)
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(read_length_prefixed(reader, max_record_size=1024)))
+    assert reader.reads == 1
+
+
+def test_read_length_prefixed_truncated():
+    with pytest.raises(asyncio.IncompleteReadError):
+        asyncio.run(_collect(read_length_prefixed(_Reader([_frames([b'abc'])[:-1]]))))
+
+
+def test_read_lines():
+    chunks = [b'ab', b'c\r\nde\n\nf', b'g']
+    assert asyncio.run(_collect(read_lines(_Reader(chunks)))) == [b'abc', b'de', b'fg']
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(read_lines(_Reader([b'x' * 100] * 5), max_record_size=256)))
+
+
+def test_run_counts_records_and_errors(tmp_path):
+    path = tmp_path / 'feed.txt'
+    write_feed_file(path, 5000, seed=1)
+    with open(path, 'ab') as f:
+        f.write(b'bad record\nid1,food,ic,1101,01,not-a-number\n')
+
+    async def main():
+        async with AsyncFile(path) as f:
+            records = _frames(b'id{},food,ic,1101,01,10'.replace(b'{}', str(i).encode()) for i in range(300))
+            return await Ingestor(batch_size=128, workers=2).run(
+                read_lines(f), read_length_prefixed(_Reader([records])))
+
+    agg = asyncio.run(main())
+    assert agg.count == 5300
+    assert agg.errors == 2
+    assert sum(n for n, _ in agg.by_cat.values()) == 5300
+    assert agg.cat_report()['food']['sum'] >= 3000
+
+
+def test_run_fails_fast_and_closes_file(tmp_path):
+    path = tmp_path / 'feed.txt'
+    write_feed_file(path, 100000, seed=2)
+    holder = {}
+
+    async def main():
+        async with AsyncFile(path) as f:
+            holder['file'] = f
+            await Ingestor(batch_size=100).run(
+                read_lines(f), read_length_prefixed(_Reader([struct.pack('>I', 1 << 30)])))
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+    assert holder['file'].closed
+
+
+def test_async_file_closed_when_cancelled(tmp_path):
+    path = tmp_path / 'feed.txt'
+    write_feed_file(path, 100000, seed=3)
+    holder = {}
+
+    async def ingest():
+        async with AsyncFile(path) as f:
+            holder['file'] = f
+            await Ingestor(batch_size=100, queue_size=1).run(read_lines(f, chunk_size=256))
+
+    async def main():
+        task = asyncio.ensure_future(ingest())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert holder['file'].closed
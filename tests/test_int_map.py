@@ -0,0 +1,100 @@
+# IntMap을 dict와 무작위로 비교
+import random
+
+import pytest
+
+from fluent_python import int_map
+from fluent_python.int_map import EMPTY, IntMap
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    # 같은 테스트를 NumPy 경로와 순수 파이썬 경로에서 모두 돌린다.
+    if request.param == 'numpy':
+        if int_map.np is None:
+            pytest.skip('needs NumPy')
+    else:
+        monkeypatch.setattr(int_map, 'np', None)
+    return request.param
+
+
+def _random_keys(rng, n):
+    pool = [rng.randint(-1000, 1000) for _ in range(50)] + [rng.randint(-(1 << 62), 1 << 62) for _ in range(50)]
+    return [rng.choice(pool) for _ in range(n)]
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('value_typecode', ['d', 'q'])
+def test_matches_dict(backend, seed, value_typecode):
+    rng = random.Random(seed)
+    m = IntMap(value_typecode=value_typecode, counts=True)
+    sums, counts = {}, {}
+    for _ in range(60):
+        op = rng.random()
+        keys = _random_keys(rng, rng.randint(0, 40))
+        if op < 0.5:
+            values = [rng.randint(-100, 100) for _ in keys]
+            m.add_at(keys, values)
+        elif op < 0.7:
+            values = [rng.randint(-100, 100)] * len(keys)
+            m.add_at(keys, values[0] if keys else 0)
+        else:
+            values = [rng.randint(-100, 100) for _ in keys]
+            for key, value in zip(keys, values):
+                m.add(key, value)
+        for key, value in zip(keys, values):
+            sums[key] = sums.get(key, 0) + value
+            counts[key] = counts.get(key, 0) + 1
+        assert len(m) == len(sums)
+    assert dict(m.items()) == sums
+    assert sorted(m) == sorted(sums)
+    assert sorted(m.values()) == sorted(sums.values())
+    for key in sums:
+        assert m[key] == sums[key]
+        assert m.count(key) == counts[key]
+        assert key in m
+    assert m == sums
+
+
+def test_setitem_and_get(backend):
+    m = IntMap()
+    d = {}
+    rng = random.Random(9)
+    for key in _random_keys(rng, 500):
+        value = rng.random()
+        m[key] = value
+        d[key] = value
+    assert dict(m.items()) == d
+    assert m.get(10 ** 30) is None
+    assert m.get('a', 0) == 0
+    assert 1.5 not in m
+    with pytest.raises(KeyError):
+        m['a']
+
+
+def test_float_keys_are_normalised(backend):
+    m = IntMap()
+    m[1.0] = 5
+    m.add(2.0, 3)
+    m.add_at([1.0, 3.0], [1, 1])
+    assert dict(m.items()) == {1: 6.0, 2: 3.0, 3: 1.0}
+    assert all(type(k) is int for k in m)
+    assert m[1] == m[1.0] == 6.0
+
+
+@pytest.mark.parametrize('keys, exc', [
+    ([1.5, 2.7], TypeError),
+    (['a'], TypeError),
+    ([float('nan')], TypeError),
+    ([1 << 64], OverflowError),
+    ([2.0 ** 70], OverflowError),
+    ([EMPTY], ValueError),
+])
+def test_rejects_bad_keys(backend, keys, exc):
+    m = IntMap()
+    m.add_at([7], [1])
+    with pytest.raises(exc):
+        m.add_at(keys, [1] * len(keys))
+    with pytest.raises(exc):
+        m[keys[0]] = 1
+    assert dict(m.items()) == {7: 1.0}
@@ -0,0 +1,174 @@
+# memoize의 single-flight, TTL, 디스크 계층 확인
+import asyncio
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fluent_python.memoize import _MISSING, DiskTier, memoize
+
+
+def test_single_flight_threads():
+    calls = []
+
+    @memoize()
+    def slow(x):
+        calls.append(x)
+        time.sleep(0.2)
+        return x * x
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(slow, [3] * 8))
+    assert results == [9] * 8
+    assert calls == [3]
+
+
+def test_single_flight_shares_exception_and_does_not_cache_it():
+    calls = []
+
+    @memoize()
+    def fail(x):
+        calls.append(x)
+        time.sleep(0.1)
+        raise KeyError(x)
+
+    def call(x):
+        with pytest.raises(KeyError):
+            fail(x)
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(call, [1] * 4))
+    assert len(calls) == 1
+    call(1)
+    assert len(calls) == 2
+
+
+def test_single_flight_asyncio_survives_cancelled_waiter():
+    calls = []
+
+    @memoize()
+    async def slow(x):
+        calls.append(x)
+        await asyncio.sleep(0.1)
+        return x ** 3
+
+    async def main():
+        first = asyncio.ensure_future(slow(2))
+        others = [asyncio.ensure_future(slow(2)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await asyncio.gather(*others)
+
+    assert asyncio.run(main()) == [8] * 4
+    assert calls == [2]
+
+
+def test_ttl_expires_memory_entry():
+    calls = []
+
+    @memoize(ttl=0.1)
+    def f(x):
+        calls.append(x)
+        return x
+
+    f(1)
+    f(1)
+    assert len(calls) == 1
+    time.sleep(0.15)
+    f(1)
+    assert len(calls) == 2
+
+
+def test_max_bytes_evicts_lru():
+    @memoize(maxsize=None, max_bytes=3000)
+    def blob(i):
+        return bytes(1000)
+
+    for i in range(5):
+        blob(i)
+    stats = blob.cache_stats()
+    assert stats.currbytes <= 3000
+    assert stats.evictions >= 2
+
+
+def test_unpicklable_result_is_returned_and_kept_in_memory(tmp_path):
+    calls = []
+
+    @memoize(max_bytes=1 << 20, path=tmp_path / 'memo.sqlite')
+    def make_lock(x):
+        calls.append(x)
+        return threading.Lock()
+
+    with ThreadPoolExecutor(4) as pool:
+        locks = list(pool.map(make_lock, [1] * 4))
+    assert len({id(lock) for lock in locks}) == 1
+    assert calls == [1]
+    assert make_lock.cache_stats().currbytes == 0
+
+
+def _squares(n):
+    return [i * i for i in range(n)]
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = tmp_path / 'memo.sqlite'
+    memoize(path=path)(_squares)(100)
+    restarted = memoize(path=path)(_squares)
+    assert restarted(100) == _squares(100)
+    stats = restarted.cache_stats()
+    assert (stats.disk_hits, stats.misses) == (1, 0)
+
+
+def test_disk_hit_keeps_remaining_ttl(tmp_path):
+    path = tmp_path / 'memo.sqlite'
+    memoize(path=path, ttl=0.5)(_squares)(10)
+    time.sleep(0.3)
+    other = memoize(path=path, ttl=0.5)(_squares)
+    other(10)
+    assert other.cache_stats().disk_hits == 1
+    # 디스크의 값은 0.5초 전에 계산되었으므로 메모리 항목도 그때 만료되어야 한다.
+    time.sleep(0.3)
+    other(10)
+    assert other.cache_stats().misses == 1
+
+
+def test_disk_tier_prunes_expired_and_caps_rows(tmp_path):
+    path = str(tmp_path / 'memo.sqlite')
+    disk = DiskTier(path, 'ns', maxsize=10)
+    for i in range(DiskTier.PRUNE_EVERY):
+        disk.set(i.to_bytes(4, 'little'), pickle.dumps(i), None)
+    count, = disk._connect().execute('SELECT COUNT(*) FROM memo').fetchone()
+    assert count == 10
+    # 가장 최근에 쓴 행들이 남는다.
+    assert disk.get((DiskTier.PRUNE_EVERY - 1).to_bytes(4, 'little'))[0] == DiskTier.PRUNE_EVERY - 1
+    assert disk.get((0).to_bytes(4, 'little')) is _MISSING
+
+    expiring = DiskTier(path, 'short')
+    for i in range(5):
+        expiring.set(bytes([i]), pickle.dumps(i), 0.01)
+    time.sleep(0.05)
+    expiring.prune()
+    count, = expiring._connect().execute('SELECT COUNT(*) FROM memo WHERE ns = ?', ('short',)).fetchone()
+    assert count == 0
+
+
+def test_async_disk_tier(tmp_path):
+    path = tmp_path / 'memo.sqlite'
+    calls = []
+
+    async def cube(x):
+        calls.append(x)
+        return x ** 3
+
+    async def main():
+        first = memoize(path=path)(cube)
+        assert await asyncio.gather(*(first(3) for _ in range(4))) == [27] * 4
+        restarted = memoize(path=path)(cube)
+        assert await restarted(3) == 27
+        return restarted.cache_stats()
+
+    stats = asyncio.run(main())
+    assert calls == [3]
+    assert stats.disk_hits == 1
@@ -0,0 +1,55 @@
+# Pipeline 단계들을 같은 일을 하는 제너레이터/리스트 컴프리헨션과 비교
+import itertools
+
+import pytest
+
+from fluent_python.pipeline import Pipeline, batched, reverse_batches
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 8, 1000])
+def test_stages_match_itertools(batch_size):
+    data = list(range(50))
+    p = Pipeline(data, batch_size=batch_size)
+    assert p.collect() == data
+    assert p.map(lambda x: x * 2).collect() == [x * 2 for x in data]
+    assert p.filter(lambda x: x % 3).collect() == [x for x in data if x % 3]
+    assert p.filter(lambda batch: [x % 3 == 0 for x in batch], batched=True).collect() == data[::3]
+    assert p.window(4, step=3).collect() == [tuple(data[i:i + 4]) for i in range(0, 47, 3)]
+    text = 'aaabccddde'
+    assert (Pipeline(text, batch_size=batch_size).group(lambda c: c).collect() ==
+            [(k, list(g)) for k, g in itertools.groupby(text)])
+    assert [len(b) for b in p.filter(lambda x: x % 2).rebatch(7).batches()] == [7, 7, 7, 4]
+    assert p.reduce(lambda acc, batch: acc + sum(batch), 0) == sum(data)
+
+
+def test_reverse_batches():
+    assert Pipeline.from_batches(reverse_batches('spam', 3)).collect() == list('maps')
+
+
+@pytest.mark.parametrize('kind', ['thread', 'process'])
+def test_parallel_map_keeps_order(kind):
+    result = Pipeline(range(100), batch_size=7).parallel_map(abs, workers=2, kind=kind, max_pending=2).collect()
+    assert result == list(range(100))
+
+
+@pytest.mark.parametrize('size', [0, -1])
+def test_rejects_batch_size_below_one(size):
+    with pytest.raises(ValueError):
+        Pipeline(range(10), batch_size=size)
+    with pytest.raises(ValueError):
+        Pipeline(range(10)).rebatch(size)
+    with pytest.raises(ValueError):
+        list(batched(range(10), size))
+    with pytest.raises(ValueError):
+        list(reverse_batches('spam', size))
+
+
+def test_filter_keeps_numpy_batches():
+    np = pytest.importorskip('numpy')
+    chunks = [np.arange(i, i + 5) for i in range(0, 20, 5)]
+    expected = [2 * x for x in range(20) if x % 3]
+    for p in (Pipeline.from_batches(chunks).filter(lambda x: x % 3),
+              Pipeline.from_batches(chunks).filter(lambda batch: batch % 3 != 0, batched=True)):
+        doubled = p.map(lambda batch: batch * 2, batched=True)
+        assert all(isinstance(b, np.ndarray) for b in doubled.batches())
+        assert [int(x) for x in doubled] == expected
@@ -0,0 +1,98 @@
+# Profiler의 표본 추출과 통계 확인
+import random
+import threading
+
+from fluent_python.profiling import Profiler
+
+
+def _build(n):
+    return [str(i) * 3 for i in range(n)]
+
+
+def test_does_not_consume_global_random():
+    profiler = Profiler(sample_rate=0.5)
+    build = profiler.profile(_build)
+    random.seed(42)
+    expected = [random.random() for _ in range(5)]
+    random.seed(42)
+    for _ in range(20):
+        build(10)
+    assert [random.random() for _ in range(5)] == expected
+
+
+def test_counts_calls_and_samples():
+    profiler = Profiler(sample_rate=1.0, cprofile=False)
+    build = profiler.profile(_build, label='build')
+    for _ in range(5):
+        build(20000)
+    stats = profiler.stats()['build']
+    assert stats['calls'] == stats['sampled'] == 5
+    assert stats['peak'] > 20000 * 3
+    assert stats['sites']
+    # 표본만 있으면 호출당 시간은 표본 평균이다.
+    assert stats['per_call'] == stats['sampled_time'] / 5
+
+
+def test_zero_sample_rate_times_only():
+    profiler = Profiler(sample_rate=0.0)
+    for _ in range(10):
+        with profiler.section('cheap'):
+            _build(100)
+    stats = profiler.stats()['cheap']
+    assert (stats['calls'], stats['sampled'], stats['peak'], stats['sites']) == (10, 0, 0, {})
+    assert stats['per_call'] > 0
+
+
+def test_exceptions_pass_through():
+    profiler = Profiler(sample_rate=1.0)
+
+    @profiler.profile
+    def fail():
+        raise KeyError('x')
+
+    try:
+        fail()
+    except KeyError:
+        pass
+    else:
+        raise AssertionError('KeyError expected')
+    assert profiler.stats()['test_exceptions_pass_through.<locals>.fail']['calls'] == 1
+
+
+def test_nested_and_concurrent_sections():
+    # tracemalloc/cProfile은 한 번에 한 구간만 쓰고, 나머지 구간은 시간만 잰다.
+    profiler = Profiler(sample_rate=1.0)
+    other = Profiler(sample_rate=1.0)
+    with profiler.section('outer'):
+        with other.section('inner'):
+            _build(100)
+    assert profiler.stats()['outer']['sampled'] == 1
+    assert other.stats()['inner'] == dict(other.stats()['inner'], calls=1, sampled=0)
+
+    def work():
+        for _ in range(20):
+            with profiler.section('threaded'):
+                _build(1000)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = profiler.stats()['threaded']
+    assert stats['calls'] == 80
+    assert 1 <= stats['sampled'] <= 80
+
+
+def test_report_lists_labels():
+    profiler = Profiler(sample_rate=1.0)
+    profiler.profile(_build, label='build_rows')(1000)
+    with profiler.section('sorting'):
+        sorted(_build(1000))
+    text = profiler.report()
+    for header in ('== time ==', '== memory (sampled calls) ==', '== allocation sites ==',
+                   '== hot paths: build_rows =='):
+        assert header in text
+    assert 'sorting' in text
+    profiler.clear()
+    assert profiler.stats() == {}
@@ -0,0 +1,94 @@
+# record_table을 네임드 튜플 리스트와 비교
+import random
+from collections import namedtuple
+
+import pytest
+
+from fluent_python.record_table import np, record_table
+
+Cities = record_table('Cities', 'name country population:d code:q')
+City = namedtuple('City', 'name country population code')
+
+
+def _rows(seed, n=300):
+    rng = random.Random(seed)
+    return [City('city{}'.format(i), rng.choice(['JP', 'IN', 'MX', 'KR']),
+                 float(rng.randint(0, 20)), rng.randint(-5, 5)) for i in range(n)]
+
+
+def test_append_is_atomic_on_bad_field():
+    t = Cities([('a', 'x', 1.0, 1)])
+    with pytest.raises(TypeError):
+        t.append(('b', 'y', 'not a float', 2))
+    with pytest.raises(TypeError):
+        t.append(('b', 'y', 2.0, 'not an int'))
+    with pytest.raises(OverflowError):
+        t.append(('b', 'y', 2.0, 1 << 70))
+    assert len(t) == 1
+    assert t[-1] == ('a', 'x', 1.0, 1)
+    t.append(('b', 'y', 2.0, 2))
+    assert list(t) == [('a', 'x', 1.0, 1), ('b', 'y', 2.0, 2)]
+
+
+def test_append_rejects_wrong_width():
+    t = Cities()
+    with pytest.raises(TypeError):
+        t.append(('a', 'x', 1.0))
+    assert len(t) == 0
+
+
+def test_extend_keeps_rows_before_bad_row():
+    t = Cities()
+    with pytest.raises(TypeError):
+        t.extend([('a', 'x', 1.0, 1), ('b', 'y', None, 2), ('c', 'z', 3.0, 3)])
+    assert list(t) == [('a', 'x', 1.0, 1)]
+
+
+@pytest.mark.skipif(np is None, reason='needs NumPy')
+def test_append_rolls_back_on_buffer_error():
+    t = Cities([('a', 'x', 1.0, 1)])
+    view = t.column('code', copy=False)
+    with pytest.raises(BufferError):
+        t.append(('b', 'y', 2.0, 2))
+    del view
+    assert len(t) == 1 and list(t) == [('a', 'x', 1.0, 1)]
+
+
+@pytest.mark.parametrize('seed', [1, 2])
+def test_matches_list_of_namedtuples(seed):
+    rows = _rows(seed)
+    t = Cities(rows)
+    assert list(t) == rows
+    assert t[5] == rows[5] and t[-1] == rows[-1]
+    assert list(t[10:20:3]) == rows[10:20:3]
+
+    assert list(t.where('population', lambda p: 5 < p < 12)) == [r for r in rows if 5 < r.population < 12]
+    assert list(t.where('country', lambda c: c == 'JP')) == [r for r in rows if r.country == 'JP']
+    for name in ('population', 'code', 'name'):
+        for reverse in (False, True):
+            expected = sorted(rows, key=lambda r: getattr(r, name), reverse=reverse)
+            assert list(t.sort_by(name, reverse=reverse)) == expected
+
+    for name in ('country', 'code'):
+        groups = t.group_by(name)
+        expected = {}
+        for r in rows:
+            expected.setdefault(getattr(r, name), []).append(r)
+        assert {k: list(v) for k, v in groups.items()} == expected
+
+    totals = t.aggregate('country', 'population')
+    for country in {r.country for r in rows}:
+        assert totals[country] == sum(r.population for r in rows if r.country == country)
+
+
+def test_from_columns_and_column_copy():
+    rows = _rows(3, n=20)
+    t = Cities.from_columns(**{name: [getattr(r, name) for r in rows] for name in City._fields})
+    assert list(t) == rows
+    col = t.column('population')
+    col[0] = -1.0
+    assert t[0].population == rows[0].population
+    t.append(rows[0])
+    assert len(t) == 21
+    with pytest.raises(ValueError):
+        Cities.from_columns(name=['a'], country=['b', 'c'], population=[1.0], code=[1])
@@ -0,0 +1,115 @@
+# RingBuffer를 deque(maxlen)와 비교하고 롤링 합계의 정확도를 확인
+import math
+import random
+from array import array
+from collections import deque
+
+import pytest
+
+from fluent_python.ring_buffer import RingBuffer
+
+
+def _check(rb, dq):
+    assert list(rb) == list(dq)
+    assert len(rb) == len(dq)
+    assert list(rb.to_array()) == list(dq)
+    if dq:
+        assert rb.sum() == pytest.approx(math.fsum(dq), rel=1e-12, abs=1e-9)
+        assert rb.min() == min(dq)
+        assert rb.max() == max(dq)
+        assert rb[0] == dq[0] and rb[-1] == dq[-1]
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('track_minmax', [True, False])
+def test_matches_deque(seed, track_minmax):
+    rng = random.Random(seed)
+    maxlen = rng.randint(1, 20)
+    rb = RingBuffer(maxlen, track_minmax=track_minmax)
+    dq = deque(maxlen=maxlen)
+    for _ in range(2000):
+        op = rng.random()
+        if op < 0.4:
+            value = float(rng.randint(-50, 50))
+            rb.append(value)
+            dq.append(value)
+        elif op < 0.6:
+            batch = [float(rng.randint(-50, 50)) for _ in range(rng.randint(0, 2 * maxlen))]
+            # 제너레이터도 deque.extend처럼 받아야 한다.
+            rb.extend(iter(batch) if rng.random() < 0.5 else batch)
+            dq.extend(batch)
+        elif op < 0.7 and dq:
+            assert rb.popleft() == dq.popleft()
+        elif op < 0.8 and dq:
+            assert rb.pop() == dq.pop()
+        elif op < 0.9:
+            value = float(rng.randint(-50, 50))
+            rb.appendleft(value)
+            dq.appendleft(value)
+        elif op < 0.98:
+            n = rng.randint(-maxlen, maxlen)
+            rb.rotate(n)
+            dq.rotate(n)
+        else:
+            rb.clear()
+            dq.clear()
+        _check(rb, dq)
+
+
+def test_window_views_cover_the_window():
+    rb = RingBuffer(10, range(10))
+    rb.extend([11, 22, 33])
+    parts = rb.window()
+    assert len(parts) == 2
+    assert [v for part in parts for v in part] == list(rb)
+
+
+def test_sum_survives_cancellation():
+    rb = RingBuffer(3)
+    rb.extend([1e20, 1, 1])
+    rb.append(1)
+    assert rb.sum() == 3.0
+    assert rb.mean() == 1.0
+
+    rb = RingBuffer(3, [1e20, 1, 1])
+    rb.extend([1, 1])
+    assert rb.sum() == 3.0
+
+
+def test_sum_tracks_mixed_magnitudes():
+    rng = random.Random(7)
+    rb = RingBuffer(50)
+    dq = deque(maxlen=50)
+    for _ in range(500):
+        batch = [rng.choice([1e18, -1e18, 1.0, 1e-3]) * rng.random() for _ in range(rng.randint(1, 30))]
+        rb.extend(batch)
+        dq.extend(batch)
+        for _ in range(rng.randint(0, 5)):
+            value = rng.random()
+            rb.append(value)
+            dq.append(value)
+        exact = math.fsum(dq)
+        assert abs(rb.sum() - exact) <= 1e-9 * max(1.0, abs(exact)) + 1e-7
+
+
+def test_integer_typecode():
+    rb = RingBuffer(4, typecode='q')
+    rb.extend(array('q', range(10)))
+    rb.append(100)
+    assert list(rb) == [7, 8, 9, 100]
+    assert rb.sum() == 124
+    assert (rb.min(), rb.max()) == (7, 100)
+
+
+def test_empty_errors():
+    rb = RingBuffer(2)
+    with pytest.raises(IndexError):
+        rb.popleft()
+    with pytest.raises(IndexError):
+        rb.pop()
+    with pytest.raises(ValueError):
+        rb.mean()
+    with pytest.raises(ValueError):
+        rb.min()
+    with pytest.raises(ValueError):
+        RingBuffer(0)
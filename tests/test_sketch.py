@@ -0,0 +1,205 @@
+# sketch 모듈의 오차 범위와 직렬화 확인
+# 해시는 blake2b이고 데이터는 시드를 고정해서 만드므로 결과가 실행마다 같다.
+import math
+import random
+
+import pytest
+
+from fluent_python.sketch import (CountMinSketch, HyperLogLog, SketchReport, SpaceSaving, cat_report_sketch,
+                                  id_report_sketch)
+
+
+def _stream(seed, n_keys=5000, n_rows=50000):
+    # 일부 키가 많이 나오는 분포 (demo와 같은 1/i 가중치)
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(n_keys)]
+    keys = ['id{}'.format(i) for i in rng.choices(range(n_keys), weights, k=n_rows)]
+    amts = [float(rng.randint(1000, 100000)) for _ in range(n_rows)]
+    return keys, amts
+
+
+def _exact(keys, amts):
+    out = {}
+    for key, amt in zip(keys, amts):
+        out[key] = out.get(key, 0.0) + amt
+    return out
+
+
+def _partitions(keys, amts, n_parts):
+    size = len(keys) // n_parts
+    return [(keys[j * size:(j + 1) * size], amts[j * size:(j + 1) * size]) for j in range(n_parts)]
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('p, n', [(10, 300), (12, 50000), (14, 200000)])
+def test_hll_within_4_sigma(seed, p, n):
+    rng = random.Random(seed)
+    keys = [rng.getrandbits(64) for _ in range(n)]
+    hll = HyperLogLog(p).update(keys)
+    assert abs(hll.estimate() - n) <= 4 * hll.standard_error() * n
+
+
+def test_hll_merge_equals_union():
+    rng = random.Random(7)
+    keys = [rng.getrandbits(64) for _ in range(20000)]
+    a = HyperLogLog(12).update(keys[:12000])
+    b = HyperLogLog(12).update(keys[8000:])
+    assert a.merge(b).registers == HyperLogLog(12).update(keys).registers
+
+
+def test_count_min_one_sided():
+    keys, amts = _stream(11)
+    exact = _exact(keys, amts)
+    delta = 0.01
+    cms = CountMinSketch(eps=0.001, delta=delta).update(keys, amts)
+    bound = cms.error_bound()
+    # 음수가 없는 값이면 과소 추정은 절대 없다.
+    assert all(cms[key] >= total for key, total in exact.items())
+    # 상한은 키마다 확률 1 - delta로 성립한다.
+    over = sum(cms[key] - total > bound for key, total in exact.items())
+    assert over <= delta * len(exact)
+
+
+def test_count_min_merge_matches_single_pass():
+    keys, amts = _stream(12)
+    merged = CountMinSketch(eps=0.01)
+    for part in _partitions(keys, amts, 4):
+        merged.merge(CountMinSketch(eps=0.01).update(*part))
+    single = CountMinSketch(eps=0.01).update(keys, amts)
+    assert merged.total == pytest.approx(single.total)
+    assert list(merged.table) == pytest.approx(list(single.table))
+
+
+def _check_space_saving(ss, exact):
+    bound = ss.total / ss.k
+    for key, (est, err) in ss.counters.items():
+        true = exact.get(key, 0.0)
+        assert est >= true - 1e-6
+        assert est - err <= true + 1e-6
+        assert est <= true + bound + 1e-6
+        assert err <= bound + 1e-6
+    # 전체 합의 1/k보다 큰 키는 반드시 남는다.
+    for key, total in exact.items():
+        if total > bound:
+            assert key in ss.counters
+
+
+@pytest.mark.parametrize('k', [10, 50, 200])
+def test_space_saving_bounds(k):
+    keys, amts = _stream(21)
+    exact = _exact(keys, amts)
+    ss = SpaceSaving(k).update(keys, amts)
+    _check_space_saving(ss, exact)
+    # 합친 적이 없으면 카운터 합은 전체 합과 같다.
+    assert sum(est for est, _ in ss.counters.values()) == pytest.approx(ss.total)
+
+
+@pytest.mark.parametrize('seed', [31, 32])
+@pytest.mark.parametrize('n_parts', [2, 4, 8])
+def test_space_saving_bounds_after_merge(seed, n_parts):
+    keys, amts = _stream(seed)
+    exact = _exact(keys, amts)
+    merged = None
+    for part in _partitions(keys, amts, n_parts):
+        ss = SpaceSaving.frombytes(bytes(SpaceSaving(50).update(*part)))
+        merged = ss if merged is None else merged.merge(ss)
+    assert merged.total == pytest.approx(sum(amts))
+    assert len(merged.counters) <= merged.k
+    _check_space_saving(merged, exact)
+
+
+def test_space_saving_keeps_working_after_merge():
+    # merge, frombytes 뒤에도 최소 힙이 카운터와 맞아야 한다.
+    keys, amts = _stream(41)
+    a = SpaceSaving(20).update(keys[:20000], amts[:20000])
+    b = SpaceSaving.frombytes(bytes(SpaceSaving(20).update(keys[20000:40000], amts[20000:40000])))
+    a.merge(b).update(keys[40000:], amts[40000:])
+    assert len(a.counters) == 20
+    _check_space_saving(a, _exact(keys, amts))
+
+
+def test_space_saving_rejects_negative():
+    with pytest.raises(ValueError):
+        SpaceSaving(3).add('a', -1.0)
+
+
+def test_bytes_round_trip():
+    keys, amts = _stream(51, n_rows=10000)
+    hll = HyperLogLog(10).update(keys)
+    again = HyperLogLog.frombytes(bytes(hll))
+    assert (again.p, again.registers) == (hll.p, hll.registers)
+    assert again.estimate() == hll.estimate()
+
+    cms = CountMinSketch(eps=0.01).update(keys, amts)
+    again = CountMinSketch.frombytes(bytes(cms))
+    assert (again.width, again.depth, again.total) == (cms.width, cms.depth, cms.total)
+    assert again.table == cms.table
+
+    ss = SpaceSaving(30).update(keys, amts)
+    again = SpaceSaving.frombytes(bytes(ss))
+    assert (again.k, again.total, again.counters) == (ss.k, ss.total, ss.counters)
+    assert again.top(5) == ss.top(5)
+
+    report = SketchReport(p=10, eps=0.01, k=30).update(keys, amts)
+    again = SketchReport.frombytes(bytes(report))
+    assert bytes(again) == bytes(report)
+    assert again.distinct() == report.distinct()
+    assert again.top(10) == report.top(10)
+    assert all(again.sum(key) == report.sum(key) for key in set(keys))
+
+
+def test_frombytes_rejects_other_sketch():
+    with pytest.raises(ValueError):
+        HyperLogLog.frombytes(bytes(CountMinSketch(eps=0.1)))
+    with pytest.raises(ValueError):
+        SpaceSaving.frombytes(bytes(HyperLogLog(4)))
+
+
+def test_hash_keeps_key_types_apart():
+    from fluent_python.sketch import _hash64
+    assert _hash64(1) != _hash64('1')
+    assert _hash64(b'1') != _hash64('1')
+    assert _hash64(1) == _hash64(1.0) == _hash64(True)
+    assert _hash64(1.5) != _hash64('1.5')
+    cms = CountMinSketch(eps=0.01).update([1, 1, '1'], [5.0, 5.0, 7.0])
+    assert (cms[1], cms['1']) == (10.0, 7.0)
+
+
+@pytest.mark.parametrize('seed', [61, 62])
+def test_report_sketches_against_pandas(seed):
+    pd = pytest.importorskip('pandas')
+    np = pytest.importorskip('numpy')
+    from fluent_python import report
+
+    rng = np.random.default_rng(seed)
+    n_ids, n_rows = 5000, 50000
+    weights = 1 / np.arange(1, n_ids + 1)
+    df = pd.DataFrame({
+        'id': rng.choice(n_ids, size=n_rows, p=weights / weights.sum()),
+        'cat': rng.choice(['t-money', 'food', 'electronic', 'drink', 'clothes'], size=n_rows),
+        'amt': rng.integers(1000, 100000, size=n_rows),
+    })
+
+    # id 열의 키는 numpy.int64(정확한 결과의 인덱스)와 int(스케치)로 섞여 나오지만 같은 키로 해시된다.
+    for make_sketch, make_exact in ((id_report_sketch, report.id_report),
+                                    (cat_report_sketch, report.cat_report)):
+        exact = make_exact(df)['sum']
+        sketch = make_sketch(df)
+        total = float(df['amt'].sum())
+
+        # 서로 다른 키의 수
+        assert abs(sketch.distinct() - len(exact)) <= 4 * sketch.hll.standard_error() * len(exact) + 1
+        # Count-Min: 과소 추정은 없고, 상한을 넘는 키는 delta 비율 이하
+        estimates = {key: sketch.sum(key) for key in exact.index}
+        assert all(estimates[key] >= value for key, value in exact.items())
+        bound = sketch.cms.error_bound()
+        assert bound == pytest.approx(math.e / sketch.cms.width * total)
+        assert sum(estimates[key] - value > bound for key, value in exact.items()) <= 0.01 * len(exact)
+        # Space-Saving: 상위 키와 오차 범위
+        k = sketch.topk.k
+        for key, est, err in sketch.top():
+            assert exact[key] <= est <= exact[key] + total / k
+            assert est - err <= exact[key]
+        heavy = exact[exact > total / k].index
+        assert set(heavy) <= {key for key, _, _ in sketch.top()}
+
@@ -0,0 +1,92 @@
+# ShardedTombola를 여러 스레드에서 쓸 때 항목이 사라지거나 중복되지 않는지 확인
+import random
+import threading
+
+import pytest
+
+from fluent_python.tombola import LockedTombola, ShardedTombola, Tombola
+
+
+def _drain(tombola, n_threads, use_pick_many):
+    # 스레드마다 비어 있을 때까지 꺼내고, 꺼낸 항목을 스레드별 리스트에 모은다.
+    results = [[] for _ in range(n_threads)]
+    barrier = threading.Barrier(n_threads)
+
+    def work(out, seed):
+        rng = random.Random(seed)
+        barrier.wait()
+        while True:
+            if use_pick_many:
+                got = tombola.pick_many(rng.randint(1, 7))
+                if not got:
+                    return
+                out.extend(got)
+            else:
+                try:
+                    out.append(tombola.pick())
+                except LookupError:
+                    return
+
+    threads = [threading.Thread(target=work, args=(results[i], i)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [item for out in results for item in out]
+
+
+@pytest.mark.parametrize('use_pick_many', [False, True])
+@pytest.mark.parametrize('n_shards', [1, 3, 16])
+def test_concurrent_drain_loses_and_duplicates_nothing(n_shards, use_pick_many):
+    tombola = ShardedTombola(range(20000), n_shards=n_shards)
+    picked = _drain(tombola, 8, use_pick_many)
+    assert sorted(picked) == list(range(20000))
+    assert not tombola.loaded()
+    with pytest.raises(LookupError):
+        tombola.pick()
+    assert tombola.pick_many(5) == []
+
+
+def test_concurrent_pick_and_reload_keeps_items():
+    tombola = ShardedTombola(range(1000), n_shards=8)
+    barrier = threading.Barrier(6)
+
+    def work(seed):
+        rng = random.Random(seed)
+        barrier.wait()
+        for _ in range(2000):
+            if rng.random() < 0.5:
+                tombola.load([tombola.pick()])
+            else:
+                tombola.load(tombola.pick_many(rng.randint(1, 20)))
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert tombola.inspect() == tuple(range(1000))
+
+
+def test_pick_steals_from_other_shards():
+    tombola = ShardedTombola(n_shards=16)
+    tombola.load(['only'])
+    assert tombola.loaded()
+    assert tombola.pick() == 'only'
+    with pytest.raises(LookupError):
+        tombola.pick()
+
+
+@pytest.mark.parametrize('cls', [ShardedTombola, LockedTombola])
+def test_empty_raises_lookup_error(cls):
+    tombola = cls()
+    assert isinstance(tombola, Tombola)
+    assert not tombola.loaded() and tombola.inspect() == ()
+    with pytest.raises(LookupError):
+        tombola.pick()
+
+
+@pytest.mark.parametrize('n_shards', [0, -1])
+def test_rejects_bad_n_shards(n_shards):
+    with pytest.raises(ValueError):
+        ShardedTombola(range(3), n_shards=n_shards)